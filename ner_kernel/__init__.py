@@ -1,7 +1,28 @@
-from .dataloader import *
 from .instance import *
-from .models import *
-from .pipeline import *
-from .validator import *
 from .logger import logger
-from .standardizer import *
\ No newline at end of file
+from .utils.lazy_import import lazy_attributes
+
+_EXPORTS = {
+    "DataLoader": ".dataloader",
+    "FileParser": ".dataloader",
+    "HtmlParser": ".dataloader",
+    "TextParser": ".dataloader",
+    "BaseNERModel": ".models",
+    "SpacyNERModel": ".models",
+    "HFNERModel": ".models",
+    "FlairNERModel": ".models",
+    "CRFNERModel": ".models",
+    "HMMNERModel": ".models",
+    "Pipeline": ".pipeline",
+    "TextChunker": ".pipeline",
+    "CheckpointStore": ".pipeline",
+    "ModelComparison": ".pipeline",
+    "NERValidator": ".validator",
+    "NERVisualizer": ".validator",
+    "ResultSink": ".validator",
+    "load_results": ".validator",
+    "LabelStandardizer": ".standardizer",
+}
+
+__all__ = ["Document", "Entity", "EntityTable", "logger", *_EXPORTS]
+__getattr__ = lazy_attributes(__name__, globals(), _EXPORTS)
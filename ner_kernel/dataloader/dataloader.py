@@ -1,14 +1,27 @@
 import os
 import json
-from typing import List, Optional, Dict
-
-from bs4 import BeautifulSoup
+import fnmatch
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Dict
 
 from .base_parser import FileParser
 from .text_parser import TextParser
 from .html_parser import HtmlParser
 from ..instance import Entity, Document
 
+# Загрузчик в процессе-воркере; передается один раз через initializer пула
+_worker_loader: Optional["DataLoader"] = None
+
+
+def _init_parse_worker(loader: "DataLoader"):
+    global _worker_loader
+    _worker_loader = loader
+
+
+def _parse_in_worker(relative_path: str) -> Document:
+    return _worker_loader._parse_path(relative_path)
+
 
 class DataLoader:
 
@@ -49,28 +62,84 @@ class DataLoader:
 
         # Case 2: Process files from directory
         elif self.path_to_files:
-            for filename in os.listdir(self.path_to_files):
-                full_path = os.path.join(self.path_to_files, filename)
-
-                if not os.path.isfile(full_path):
-                    continue
-
-                _, ext = os.path.splitext(filename)
-                ext = ext.lower()
-
-                if ext not in self.parsers:
-                    continue
-
-                with open(full_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+            documents = list(self.iter_documents())
+        return documents
 
-                gold_markup = []
-                if self.path_to_markups:
-                    gold_markup = self._load_gold_markup(filename)
+    def iter_documents(
+        self,
+        recursive: bool = False,
+        patterns: Optional[List[str]] = None,
+        n_workers: int = 1,
+        executor: str = "thread",
+        prefetch: Optional[int] = None
+    ) -> Iterator[Document]:
+        """
+        Ленивая загрузка документов из path_to_files: файлы обходятся без полного
+        листинга и разбираются пулом потоков (executor="thread") или процессов
+        ("process", выгодно для HtmlParser). В работе одновременно не более
+        prefetch файлов, порядок выдачи совпадает с порядком обхода.
+        :param patterns: glob-шаблоны относительного пути, например ["*.html", "news/*"]
+        """
+        paths = self._iter_files(recursive, patterns)
+        if n_workers <= 1:
+            yield from map(self._parse_path, paths)
+            return
+
+        window = prefetch or n_workers * 4
+        if executor == "process":
+            # Загрузчик с парсерами сериализуется один раз на воркер, а не на каждый файл
+            with ProcessPoolExecutor(
+                max_workers=n_workers, initializer=_init_parse_worker, initargs=(self,)
+            ) as pool:
+                yield from self._map_bounded(pool, _parse_in_worker, paths, window)
+        else:
+            with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                yield from self._map_bounded(pool, self._parse_path, paths, window)
 
-                doc = self.parsers[ext].parse_file(filename, content, gold_markup)
-                documents.append(doc)
-        return documents
+    @staticmethod
+    def _map_bounded(pool: Executor, func: Callable, items: Iterable, window: int) -> Iterator:
+        futures = deque()
+        for item in items:
+            futures.append(pool.submit(func, item))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+    def _iter_files(self, recursive: bool, patterns: Optional[List[str]]) -> Iterator[str]:
+        """Относительные пути подходящих файлов в path_to_files"""
+        stack = [""]
+        while stack:
+            relative_dir = stack.pop()
+            with os.scandir(os.path.join(self.path_to_files, relative_dir)) as entries:
+                for entry in entries:
+                    relative_path = os.path.join(relative_dir, entry.name)
+                    if entry.is_dir():
+                        if recursive:
+                            stack.append(relative_path)
+                        continue
+                    if not entry.is_file():
+                        continue
+
+                    _, ext = os.path.splitext(entry.name)
+                    if ext.lower() not in self.parsers:
+                        continue
+                    if patterns and not any(fnmatch.fnmatch(relative_path, p) for p in patterns):
+                        continue
+                    yield relative_path
+
+    def _parse_path(self, relative_path: str) -> Document:
+        full_path = os.path.join(self.path_to_files, relative_path)
+        _, ext = os.path.splitext(relative_path)
+
+        with open(full_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+        gold_markup = []
+        if self.path_to_markups:
+            gold_markup = self._load_gold_markup(relative_path)
+
+        return self.parsers[ext.lower()].parse_file(relative_path, content, gold_markup)
 
     def _load_gold_markup(self, filename: str) -> List[Entity]:
         base_name, _ = os.path.splitext(filename)
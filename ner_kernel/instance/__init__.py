@@ -1,2 +1,3 @@
 from .document import Document
 from .entity import Entity
+from .entity_table import EntityTable
@@ -1,20 +1,35 @@
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple, Union
 from .entity import Entity
+from .entity_table import EntityTable
+from ..utils.tokenizer import TokenizedText, tokenize
 
 
-@dataclass
+@dataclass(slots=True)
 class Document:
     name: Optional[str] = None
 
     text: str = ""
     plaintext: str = ""
 
-    gold_markup: List[Entity] = field(default_factory=list)
-    pred_markup: List[Entity] = field(default_factory=list)
+    # Список Entity или компактная EntityTable
+    gold_markup: Union[List[Entity], EntityTable] = field(default_factory=list)
+    pred_markup: Union[List[Entity], EntityTable] = field(default_factory=list)
 
     metadata: Optional[Dict[str, str]] = field(default_factory=dict)
 
+    # Исходные метки gold-разметки до стандартизации (по порядку сущностей),
+    # чтобы при изменении маппинга переводить заново из них
+    gold_source_labels: Optional[List[str]] = field(default=None, init=False, repr=False, compare=False)
+
+    # Кэш токенизации plaintext, общий для всех моделей, которые его используют
+    _tokenized: Optional[Tuple[str, TokenizedText]] = field(default=None, init=False, repr=False, compare=False)
+
     def __post_init__(self):
         if not self.text or not self.plaintext:
             raise ValueError("Пустой текст недопустим.")
+
+    def tokens(self) -> TokenizedText:
+        if self._tokenized is None or self._tokenized[0] is not self.plaintext:
+            self._tokenized = (self.plaintext, tokenize(self.plaintext))
+        return self._tokenized[1]
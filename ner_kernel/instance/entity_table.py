@@ -0,0 +1,108 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from .entity import Entity
+
+
+class EntityTable:
+    """
+    Колоночная разметка документа: массивы начал и концов сущностей и номера
+    меток в общем словаре labels. Текст сущностей не хранится, а берется срезом
+    source (plaintext документа) при обращении. Итерация и индексация выдают
+    Entity, поэтому таблица подходит везде, где ожидается список сущностей.
+    """
+
+    __slots__ = ("starts", "ends", "label_ids", "labels", "source")
+
+    def __init__(
+        self,
+        starts: Iterable[int],
+        ends: Iterable[int],
+        label_ids: Iterable[int],
+        labels: List[str],
+        source: Optional[str] = None
+    ):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.label_ids = np.asarray(label_ids, dtype=np.int32)
+        self.labels = list(labels)
+        self.source = source
+
+    @classmethod
+    def from_entities(cls, entities: Iterable[Entity], source: Optional[str] = None) -> "EntityTable":
+        if isinstance(entities, EntityTable):
+            return entities
+        label_index: Dict[str, int] = {}
+        starts, ends, label_ids = [], [], []
+        for ent in entities:
+            starts.append(ent.start_offset)
+            ends.append(ent.end_offset)
+            label_ids.append(label_index.setdefault(ent.entity, len(label_index)))
+        return cls(starts, ends, label_ids, list(label_index), source)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Entity, "EntityTable"]:
+        if isinstance(i, slice):
+            # Срез - таблица над тем же словарем меток и тем же source
+            return EntityTable(self.starts[i], self.ends[i], self.label_ids[i], self.labels, self.source)
+        if not isinstance(i, (int, np.integer)):
+            raise TypeError(f"Индекс EntityTable должен быть int или slice, получено {type(i).__name__}")
+        start, end = int(self.starts[i]), int(self.ends[i])
+        return Entity(
+            entity=self.labels[self.label_ids[i]],
+            start_offset=start,
+            end_offset=end,
+            text=self.source[start:end] if self.source is not None else ""
+        )
+
+    def __iter__(self) -> Iterator[Entity]:
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (EntityTable, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EntityTable({len(self)} entities, labels={self.labels})"
+
+    def entity_labels(self) -> np.ndarray:
+        """Метки всех сущностей (массив строк)"""
+        return np.array(self.labels, dtype=object)[self.label_ids]
+
+    def texts(self) -> List[str]:
+        if self.source is None:
+            return [""] * len(self)
+        return [self.source[start:end] for start, end in zip(self.starts.tolist(), self.ends.tolist())]
+
+    def map_labels(self, mapping: Callable[[str], str]) -> "EntityTable":
+        """
+        Новая таблица с переименованными метками. Маппинг применяется к словарю
+        меток, а номера меток сущностей переводятся одной таблицей подстановки.
+        """
+        new_index: Dict[str, int] = {}
+        lookup = np.array(
+            [new_index.setdefault(mapping(label), len(new_index)) for label in self.labels],
+            dtype=np.int32
+        )
+        label_ids = lookup[self.label_ids] if len(self.labels) else self.label_ids
+        return EntityTable(self.starts, self.ends, label_ids, list(new_index), self.source)
+
+    def with_labels(self, labels: Iterable[str]) -> "EntityTable":
+        """Таблица с теми же границами и заданными метками сущностей (по порядку)"""
+        label_index: Dict[str, int] = {}
+        label_ids = [label_index.setdefault(label, len(label_index)) for label in labels]
+        if len(label_ids) != len(self):
+            raise ValueError("Число меток не совпадает с числом сущностей")
+        return EntityTable(self.starts, self.ends, label_ids, list(label_index), self.source)
+
+    def to_dicts(self) -> List[Dict[str, Union[str, int]]]:
+        """Сущности в виде словарей (как dataclasses.asdict для Entity)"""
+        labels = self.entity_labels().tolist()
+        return [
+            {"entity": label, "start_offset": start, "end_offset": end, "text": text}
+            for label, start, end, text in zip(labels, self.starts.tolist(), self.ends.tolist(), self.texts())
+        ]
@@ -1,6 +1,14 @@
 from .base_model import BaseNERModel
-from .spacy_model import SpacyNERModel
-from .hugging_face_model import HFNERModel
-from .flair_model import FlairNERModel
-from .crf_model import CRFNERModel
-from .hmm_model import HMMNERModel
+from ..utils.lazy_import import lazy_attributes
+
+# Обертки импортируются при первом обращении, чтобы не грузить все фреймворки сразу
+_EXPORTS = {
+    "SpacyNERModel": ".spacy_model",
+    "HFNERModel": ".hugging_face_model",
+    "FlairNERModel": ".flair_model",
+    "CRFNERModel": ".crf_model",
+    "HMMNERModel": ".hmm_model",
+}
+
+__all__ = ["BaseNERModel", *_EXPORTS]
+__getattr__ = lazy_attributes(__name__, globals(), _EXPORTS)
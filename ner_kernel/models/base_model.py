@@ -1,32 +1,77 @@
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, Dict, List, Optional
 
 from ..instance import Document, Entity
+from ..utils.tokenizer import TokenizedText, tokenize
 
 
 class BaseNERModel(ABC):
     # Base class for all NER models
-    def __init__(self):
+    batch_size: int = 32
+    # True - модель работает по токенам и переиспользует токенизацию документа
+    tokenized_input: bool = False
+    # Аргументы init_kwargs, не влияющие на предсказания (размер пакета, процессы,
+    # каталоги кэша); не входят в ключи контрольных точек и кэша сервиса
+    NON_PREDICTIVE_KWARGS = ("batch_size", "n_process", "max_batch_tokens", "cache_dir")
+
+    def __init__(self, batch_size: int = 32):
         self.model_name = "Base"
         self.entity_label = "MISC"
+        self.batch_size = batch_size
 
     def predict_entities(self, text: str) -> List[Entity]:
+        tokenized = tokenize(text)
         result_entities = []
-        for entity_span in [word for word in text.split() if word.istitle()]:
-            start_position = text.find(entity_span)
-            e = Entity(
-                entity=self.entity_label,
-                start_offset=start_position,
-                end_offset=start_position + len(entity_span),
-                text=entity_span
-            )
-            result_entities.append(e)
+        for word, start, end in zip(tokenized.tokens, tokenized.starts.tolist(), tokenized.ends.tolist()):
+            if word.istitle():
+                e = Entity(
+                    entity=self.entity_label,
+                    start_offset=start,
+                    end_offset=end,
+                    text=word
+                )
+                result_entities.append(e)
         return result_entities
 
+    def predict_batch(self, texts: List[str]) -> List[List[Entity]]:
+        """
+        Пакетное предсказание: для каждого текста возвращается список сущностей
+        в том же порядке. Наследники переопределяют метод нативным батчингом.
+        """
+        return [self.predict_entities(text) for text in texts]
+
+    def predict_tokenized(self, texts: List[str], tokenized: List[TokenizedText]) -> List[List[Entity]]:
+        """Пакетное предсказание по готовой токенизации (для tokenized_input = True)"""
+        return self.predict_batch(texts)
+
     def predict_document(self, doc: Document) -> Document:
         predicted = self.predict_entities(doc.plaintext)
         doc.pred_markup = predicted
         return doc
 
+    def predict_documents(self, docs: List[Document]) -> List[Document]:
+        texts = [doc.plaintext for doc in docs]
+        if self.tokenized_input:
+            predictions = self.predict_tokenized(texts, [doc.tokens() for doc in docs])
+        else:
+            predictions = self.predict_batch(texts)
+        for doc, predicted in zip(docs, predictions):
+            doc.pred_markup = predicted
+        return docs
+
+    def init_kwargs(self) -> Optional[Dict[str, Any]]:
+        """
+        Аргументы конструктора, по которым модель можно заново создать в другом
+        процессе. None - модель передается целиком через pickle (обученные CRF/HMM).
+        """
+        return None
+
+    def state_fingerprint(self) -> Optional[str]:
+        """
+        Хэш обученного состояния для моделей без init_kwargs (ключ контрольных
+        точек меняется после переобучения). None - состояние не определено.
+        """
+        return None
+
     def change_model(self, model_name: str):
         pass
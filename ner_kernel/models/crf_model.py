@@ -1,17 +1,22 @@
+import hashlib
 import logging
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 import numpy as np
 from sklearn_crfsuite import CRF
 from sklearn_crfsuite.metrics import flat_classification_report
 from ..instance import Document, Entity
 from .base_model import BaseNERModel
+from ..utils.tokenizer import TokenizedText, tokenize
 from ..logger import logger
 
 
 class CRFNERModel(BaseNERModel):
     # CRF model
-    def __init__(self, model_name: str = "crf_ner", **kwargs):
+    tokenized_input = True
+
+    def __init__(self, model_name: str = "crf_ner", batch_size: int = 256, **kwargs):
         self.model_name = model_name
+        self.batch_size = batch_size
         self.crf = CRF(
             algorithm='lbfgs',
             c1=0.1,
@@ -70,44 +75,69 @@ class CRFNERModel(BaseNERModel):
         logger.info("CRF модель успешно обучена")
 
     def predict_entities(self, text: str) -> List[Entity]:
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: List[str]) -> List[List[Entity]]:
+        return self.predict_tokenized(texts, [tokenize(text) for text in texts])
+
+    def predict_tokenized(self, texts: List[str], tokenized: List[TokenizedText]) -> List[List[Entity]]:
         if not self.is_trained:
             logger.warning(
-                "CRF модель не обучена. Возвращаю пустой список сущностей.")
-            return []
+                "CRF модель не обучена. Возвращаю пустые списки сущностей.")
+            return [[] for _ in texts]
 
-        words = text.split()
-        X = self._sent2features(words)
-        y_pred = self.crf.predict([X])[0]
+        sentences = [t.tokens for t in tokenized]
+        result = []
+        for start in range(0, len(sentences), self.batch_size):
+            batch = sentences[start:start + self.batch_size]
+            X = [self._sent2features(words) for words in batch]
+            y_pred = self.crf.predict(X)
+            result.extend(
+                self._labels_to_entities(text, t, labels)
+                for text, t, labels in zip(
+                    texts[start:start + self.batch_size],
+                    tokenized[start:start + self.batch_size],
+                    y_pred
+                )
+            )
+        return result
 
+    @staticmethod
+    def _labels_to_entities(text: str, tokenized: TokenizedText, y_pred: List[str]) -> List[Entity]:
+        # Смещения берутся из токенизации, текст сущности - срез исходного текста
         result_entities = []
         current_entity = None
-        start_pos = 0
 
-        for i, (word, label) in enumerate(zip(words, y_pred)):
+        for start, end, label in zip(tokenized.starts.tolist(), tokenized.ends.tolist(), y_pred):
             if label.startswith('B-'):
                 if current_entity:
                     result_entities.append(current_entity)
                 current_entity = Entity(
                     entity=label[2:],
-                    start_offset=start_pos,
-                    end_offset=start_pos + len(word),
-                    text=word
+                    start_offset=start,
+                    end_offset=end,
+                    text=text[start:end]
                 )
             elif label.startswith('I-') and current_entity and current_entity.entity == label[2:]:
-                current_entity.text += ' ' + word
-                current_entity.end_offset = start_pos + len(word)
+                current_entity.end_offset = end
+                current_entity.text = text[current_entity.start_offset:end]
             else:
                 if current_entity:
                     result_entities.append(current_entity)
                     current_entity = None
 
-            start_pos += len(word) + 1  # +1 for space
-
         if current_entity:
             result_entities.append(current_entity)
 
         return result_entities
 
+    def state_fingerprint(self) -> Optional[str]:
+        # Файл модели crfsuite полностью определяет предсказания
+        if not self.is_trained or self.crf.modelfile.name is None:
+            return None
+        with open(self.crf.modelfile.name, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
     def change_model(self, model_name: str):
         if self.model_name != model_name:
             self.model_name = model_name
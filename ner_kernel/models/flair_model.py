@@ -1,32 +1,74 @@
 from flair.data import Sentence
 from flair.models import SequenceTagger
-from typing import List
+from flair.splitter import SegtokSentenceSplitter
+from typing import Any, Dict, List
 from ..instance import Document, Entity
 from .base_model import BaseNERModel
 
 
 class FlairNERModel(BaseNERModel):
     # BiLSTM + CRF
-    def __init__(self, model_name: str = "ner-fast"):
+    def __init__(self, model_name: str = "ner-fast", batch_size: int = 32, split_sentences: bool = True):
         # Можно указать "ner", "ner-fast", "ner-ontonotes-fast" и т.п.
-        self.model_name = "ner-fast"
+        self.model_name = model_name
+        # mini_batch_size для tagger.predict - число предложений в пакете
+        self.batch_size = batch_size
+        # Длинный текст делится на предложения, чтобы BiLSTM-CRF не прогонял
+        # одну огромную последовательность
+        self.split_sentences = split_sentences
+        self.splitter = SegtokSentenceSplitter() if split_sentences else None
         self.tagger = SequenceTagger.load(model_name, weights_only=False)
 
     def predict_entities(self, text: str) -> List[Entity]:
-        sentence = Sentence(text)
-        self.tagger.predict(sentence)
-        result_entities = []
-        for entity_span in sentence.get_spans('ner'):
-            entity_label = entity_span.get_label("ner").value
-            e = Entity(
-                entity=entity_label,
-                start_offset=entity_span.start_position,
-                end_offset=entity_span.end_position,
-                text=text[entity_span.start_position:entity_span.end_position]
+        return self.predict_batch([text])[0]
+
+    def _split(self, text: str) -> List[Sentence]:
+        # У предложений от splitter start_position - смещение в исходном тексте
+        if self.splitter is None:
+            return [Sentence(text)]
+        return self.splitter.split(text)
+
+    def predict_batch(self, texts: List[str]) -> List[List[Entity]]:
+        if not texts:
+            return []
+        text_sentences = [self._split(text) for text in texts]
+        sentences = [sentence for group in text_sentences for sentence in group]
+        if sentences:
+            # embedding_storage_mode="none": эмбеддинги токенов освобождаются сразу
+            self.tagger.predict(
+                sentences, mini_batch_size=self.batch_size, embedding_storage_mode="none"
             )
-            result_entities.append(e)
+        return [
+            self._sentences_to_entities(text, group)
+            for text, group in zip(texts, text_sentences)
+        ]
+
+    @staticmethod
+    def _sentences_to_entities(text: str, sentences: List[Sentence]) -> List[Entity]:
+        result_entities = []
+        for sentence in sentences:
+            offset = getattr(sentence, "start_position", 0) or 0
+            for entity_span in sentence.get_spans('ner'):
+                entity_label = entity_span.get_label("ner").value
+                start = offset + entity_span.start_position
+                end = offset + entity_span.end_position
+                e = Entity(
+                    entity=entity_label,
+                    start_offset=start,
+                    end_offset=end,
+                    text=text[start:end]
+                )
+                result_entities.append(e)
         return result_entities
 
+    def init_kwargs(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "batch_size": self.batch_size,
+            "split_sentences": self.split_sentences
+        }
+
     def change_model(self, model_name: str):
         if self.model_name != model_name:
-            self.tagger = SequenceTagger.load(model_name)
+            self.model_name = model_name
+            self.tagger = SequenceTagger.load(model_name, weights_only=False)
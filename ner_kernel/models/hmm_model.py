@@ -1,15 +1,21 @@
-from typing import List, Dict, Set
+import hashlib
+import json
+from typing import List, Dict, Optional, Set
 import numpy as np
 from hmmlearn.hmm import CategoricalHMM
 from ..instance import Document, Entity
 from .base_model import BaseNERModel
+from ..utils.tokenizer import TokenizedText, tokenize
 from ..logger import logger
 
 
 class HMMNERModel(BaseNERModel):
     # HMM model
-    def __init__(self, model_name: str = "hmm_ner"):
+    tokenized_input = True
+
+    def __init__(self, model_name: str = "hmm_ner", batch_size: int = 256):
         self.model_name = model_name
+        self.batch_size = batch_size
         self.model = None
         self.word_to_idx: Dict[str, int] = {}
         self.idx_to_word: Dict[int, str] = {}
@@ -95,26 +101,50 @@ class HMMNERModel(BaseNERModel):
         logger.info("HMM модель успешно обучена")
 
     def predict_entities(self, text: str) -> List[Entity]:
-        if not self.is_trained:
-            logger.warning(
-                "HMM модель не обучена. Возвращаю пустой список сущностей.")
-            return []
-
-        # Подготовка входных данных
-        words = text.split()
-        X = [self.word_to_idx.get(word, len(self.word_to_idx) - 1)
-             for word in words]
-        X = np.array(X).reshape(-1, 1)
+        return self.predict_batch([text])[0]
 
-        # Предсказание меток
-        y_pred = self.model.predict(X)
+    def predict_batch(self, texts: List[str]) -> List[List[Entity]]:
+        return self.predict_tokenized(texts, [tokenize(text) for text in texts])
 
-        # Преобразование предсказаний в сущности
+    def predict_tokenized(self, texts: List[str], tokenized: List[TokenizedText]) -> List[List[Entity]]:
+        if not self.is_trained:
+            logger.warning(
+                "HMM модель не обучена. Возвращаю пустые списки сущностей.")
+            return [[] for _ in texts]
+
+        sentences = [t.tokens for t in tokenized]
+        result = []
+        for start in range(0, len(sentences), self.batch_size):
+            batch = sentences[start:start + self.batch_size]
+            non_empty = [words for words in batch if words]
+            if not non_empty:
+                result.extend([] for _ in batch)
+                continue
+
+            # Подготовка входных данных: все последовательности пакета
+            # склеиваются в одну, границы передаются через lengths
+            unknown_idx = len(self.word_to_idx) - 1
+            X = [self.word_to_idx.get(word, unknown_idx)
+                 for words in non_empty for word in words]
+            X = np.array(X).reshape(-1, 1)
+            lengths = [len(words) for words in non_empty]
+
+            # Предсказание меток
+            y_pred = self.model.predict(X, lengths=lengths)
+
+            offset = 0
+            for text, t in zip(texts[start:start + self.batch_size], tokenized[start:start + self.batch_size]):
+                labels = y_pred[offset:offset + len(t)]
+                offset += len(t)
+                result.append(self._labels_to_entities(text, t, labels))
+        return result
+
+    def _labels_to_entities(self, text: str, tokenized: TokenizedText, y_pred: np.ndarray) -> List[Entity]:
+        # Преобразование предсказаний в сущности; смещения берутся из токенизации
         result_entities = []
         current_entity = None
-        start_pos = 0
 
-        for i, (word, label_idx) in enumerate(zip(words, y_pred)):
+        for start, end, label_idx in zip(tokenized.starts.tolist(), tokenized.ends.tolist(), y_pred):
             label = self.idx_to_tag[label_idx]
 
             if label.startswith('B-'):
@@ -122,25 +152,32 @@ class HMMNERModel(BaseNERModel):
                     result_entities.append(current_entity)
                 current_entity = Entity(
                     entity=label[2:],
-                    start_offset=start_pos,
-                    end_offset=start_pos + len(word),
-                    text=word
+                    start_offset=start,
+                    end_offset=end,
+                    text=text[start:end]
                 )
             elif label.startswith('I-') and current_entity and current_entity.entity == label[2:]:
-                current_entity.text += ' ' + word
-                current_entity.end_offset = start_pos + len(word)
+                current_entity.end_offset = end
+                current_entity.text = text[current_entity.start_offset:end]
             else:
                 if current_entity:
                     result_entities.append(current_entity)
                     current_entity = None
 
-            start_pos += len(word) + 1  # +1 for space
-
         if current_entity:
             result_entities.append(current_entity)
 
         return result_entities
 
+    def state_fingerprint(self) -> Optional[str]:
+        if not self.is_trained or self.model is None:
+            return None
+        digest = hashlib.sha256()
+        for params in (self.model.startprob_, self.model.transmat_, self.model.emissionprob_):
+            digest.update(np.ascontiguousarray(params).tobytes())
+        digest.update(json.dumps([self.word_to_idx, self.tag_to_idx], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
     def change_model(self, model_name: str):
         if self.model_name != model_name:
             self.model_name = model_name
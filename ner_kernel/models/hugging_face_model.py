@@ -1,23 +1,140 @@
+import os
+import time
 from transformers import AutoTokenizer, AutoModelForTokenClassification, pipeline
-from typing import List
+from typing import Any, Dict, List, Optional
 from ..instance import Document, Entity
+from ..logger import logger
 from .base_model import BaseNERModel
 
+BACKENDS = ("torch", "onnx", "quantized")
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ner_kernel", "onnx")
+
 
 class HFNERModel(BaseNERModel):
     # Transformer model from Hugging Face
-    def __init__(self, model_name: str = "dslim/bert-base-NER"):
-        self.model_name = "dslim/bert-base-NER"
+    def __init__(
+        self,
+        model_name: str = "dslim/bert-base-NER",
+        batch_size: int = 8,
+        max_batch_tokens: Optional[int] = 4096,
+        backend: str = "torch",
+        cache_dir: Optional[str] = None
+    ):
+        """
+        backend: "torch" - исходная модель, "onnx" - экспорт в ONNX Runtime,
+        "quantized" - ONNX с динамическим int8-квантованием (нужен optimum[onnxruntime]).
+        Экспортированные модели кэшируются в cache_dir по имени модели.
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестный backend: {backend}")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        # Бюджет токенов на пакет с учетом паддинга; None - фиксированный batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.backend = backend
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self._load(model_name)
+
+    def _load(self, model_name: str):
         self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForTokenClassification.from_pretrained(
-            model_name)
+        if self.backend == "torch":
+            self.model = AutoModelForTokenClassification.from_pretrained(
+                model_name)
+        else:
+            self.model = self._load_onnx(model_name)
         self.ner_pipeline = pipeline(
             "ner", model=self.model,
             tokenizer=self.tokenizer, aggregation_strategy="simple"
         )
 
+    def _export_dir(self, model_name: str) -> str:
+        return os.path.join(self.cache_dir, model_name.replace("/", "--"), self.backend)
+
+    def _load_onnx(self, model_name: str):
+        """
+        Экспорт в ONNX (и квантование) выполняется один раз, дальше модель
+        загружается из кэша. Группировка сущностей и смещения считает тот же
+        pipeline transformers, меняется только исполнитель модели.
+        """
+        from optimum.onnxruntime import ORTModelForTokenClassification
+
+        export_dir = self._export_dir(model_name)
+        file_name = "model_quantized.onnx" if self.backend == "quantized" else "model.onnx"
+        if os.path.isfile(os.path.join(export_dir, file_name)):
+            return ORTModelForTokenClassification.from_pretrained(export_dir, file_name=file_name)
+
+        logger.info(f"Экспорт {model_name} в ONNX ({self.backend}) в {export_dir}")
+        onnx_dir = os.path.join(os.path.dirname(export_dir), "onnx")
+        if os.path.isfile(os.path.join(onnx_dir, "model.onnx")):
+            model = ORTModelForTokenClassification.from_pretrained(onnx_dir)
+        else:
+            model = ORTModelForTokenClassification.from_pretrained(model_name, export=True)
+            model.save_pretrained(onnx_dir)
+        if self.backend == "onnx":
+            return model
+
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        # Динамическое int8-квантование весов линейных слоев, активации - на лету
+        quantizer = ORTQuantizer.from_pretrained(model)
+        quantizer.quantize(
+            save_dir=export_dir,
+            quantization_config=AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        )
+        model.config.save_pretrained(export_dir)
+        return ORTModelForTokenClassification.from_pretrained(export_dir, file_name=file_name)
+
     def predict_entities(self, text: str) -> List[Entity]:
-        ner_result = self.ner_pipeline(text)
+        return self._result_to_entities(text, self.ner_pipeline(text))
+
+    def predict_batch(self, texts: List[str]) -> List[List[Entity]]:
+        if not texts:
+            return []
+        if self.max_batch_tokens is None:
+            ner_results = self.ner_pipeline(texts, batch_size=self.batch_size)
+            return [
+                self._result_to_entities(text, ner_result)
+                for text, ner_result in zip(texts, ner_results)
+            ]
+
+        result_entities: List[List[Entity]] = [[] for _ in texts]
+        for indices in self._token_budget_batches(texts):
+            batch_texts = [texts[i] for i in indices]
+            ner_results = self.ner_pipeline(batch_texts, batch_size=len(batch_texts))
+            for i, ner_result in zip(indices, ner_results):
+                result_entities[i] = self._result_to_entities(texts[i], ner_result)
+        return result_entities
+
+    def _token_budget_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Группирует индексы текстов в пакеты по длине в токенах: тексты сортируются
+        по убыванию длины, и пакет пополняется, пока len(batch) * max_len
+        (объем с учетом паддинга) не превышает max_batch_tokens.
+        """
+        encoded = self.tokenizer(
+            texts, add_special_tokens=True, truncation=True,
+            max_length=self.tokenizer.model_max_length
+        )
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+        batches = []
+        current: List[int] = []
+        current_max = 0
+        for i in order:
+            batch_max = max(current_max, lengths[i])
+            if current and (len(current) + 1) * batch_max > self.max_batch_tokens:
+                batches.append(current)
+                current, batch_max = [], lengths[i]
+            current.append(i)
+            current_max = batch_max
+        if current:
+            batches.append(current)
+        return batches
+
+    @staticmethod
+    def _result_to_entities(text: str, ner_result: List[dict]) -> List[Entity]:
         # ner_result — список словарей вида
         # [{'entity_group': 'PER', 'score': 0.999, 'word': 'Илон', 'start': 0, 'end': 4}, ...]
         result_entities = []
@@ -31,13 +148,59 @@ class HFNERModel(BaseNERModel):
             result_entities.append(e)
         return result_entities
 
+    def init_kwargs(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "batch_size": self.batch_size,
+            "max_batch_tokens": self.max_batch_tokens,
+            "backend": self.backend,
+            "cache_dir": self.cache_dir
+        }
+
+    def check_drift(
+        self,
+        texts: List[str],
+        reference: Optional["HFNERModel"] = None
+    ) -> Dict[str, float]:
+        """
+        Сравнение с fp32-моделью (backend="torch") на корпусе texts: предсказания
+        эталона считаются gold-разметкой, совпадение сущностей - точное
+        (метка и границы). Возвращает метрики согласия и время обеих моделей.
+        """
+        from ..validator import NERValidator
+
+        reference = reference or HFNERModel(
+            self.model_name, batch_size=self.batch_size, max_batch_tokens=self.max_batch_tokens
+        )
+        start = time.perf_counter()
+        expected = reference.predict_batch(texts)
+        reference_time = time.perf_counter() - start
+        start = time.perf_counter()
+        predicted = self.predict_batch(texts)
+        backend_time = time.perf_counter() - start
+
+        docs = [
+            Document(name=str(i), text=text, plaintext=text, gold_markup=gold, pred_markup=pred)
+            for i, (text, gold, pred) in enumerate(zip(texts, expected, predicted))
+            if text
+        ]
+        micro = NERValidator(match_mode="exact").evaluate(docs)["micro_avg"]
+        report = {
+            "precision": micro["precision"],
+            "recall": micro["recall"],
+            "f1": micro["f1"],
+            "identical_documents": sum(gold == pred for gold, pred in zip(expected, predicted)) / max(len(texts), 1),
+            "reference_sec": reference_time,
+            "backend_sec": backend_time
+        }
+        logger.info(
+            f"Дрейф {self.backend} относительно fp32 для {self.model_name}: F1 согласия {report['f1']:.4f}, "
+            f"идентичных документов {report['identical_documents']:.2%}, "
+            f"время {backend_time:.2f} сек против {reference_time:.2f} сек"
+        )
+        return report
+
     def change_model(self, model_name: str):
         if self.model_name != model_name:
             self.model_name = model_name
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            self.model = AutoModelForTokenClassification.from_pretrained(
-                model_name)
-            self.ner_pipeline = pipeline(
-                "ner", model=self.model,
-                tokenizer=self.tokenizer, aggregation_strategy="simple"
-            )
+            self._load(model_name)
@@ -1,22 +1,103 @@
 import spacy
 import subprocess
 import sys
+import time
 import logging
 
-from typing import List
+from pathlib import Path
+from typing import Any, Dict, List, Set
 from ..instance import Document, Entity
 from .base_model import BaseNERModel
 from ..logger import logger
 
 
+# Компоненты, которые сами выставляют doc.ents
+ENTITY_FACTORIES = {"ner", "beam_ner", "entity_ruler", "span_ruler", "entity_linker"}
+# Компоненты, которые могут быть источником признаков для listener-слоя ner
+EMBEDDING_FACTORIES = {"tok2vec", "transformer", "curated_transformer"}
+
+
 class SpacyNERModel(BaseNERModel):
     # CNN or LSTM
-    def __init__(self, model_name: str = "ru_core_news_sm", **kwargs):
+    def __init__(
+        self,
+        model_name: str = "ru_core_news_sm",
+        batch_size: int = 32,
+        ner_only: bool = True,
+        n_process: int = 1,
+        **kwargs
+    ):
+        """
+        ner_only: при загрузке исключаются компоненты, не нужные для doc.ents
+        (tagger, parser, lemmatizer, morphologizer...); общий tok2vec сохраняется,
+        если ner его слушает. n_process - число процессов nlp.pipe для корпусов.
+        """
         self.model_name = model_name
+        self.batch_size = batch_size
+        self.ner_only = ner_only
+        self.n_process = n_process
+        self.load_kwargs = kwargs
+        self._load(model_name)
+
+    def _load(self, model_name: str):
         self._ensure_model_installed(model_name)
-        self.nlp = spacy.load(model_name, **kwargs)
+        load_kwargs = dict(self.load_kwargs)
+        if self.ner_only:
+            exclude = set(load_kwargs.pop("exclude", [])) | self._non_ner_components(model_name)
+            load_kwargs["exclude"] = sorted(exclude)
+        self.nlp = spacy.load(model_name, **load_kwargs)
+
+    @staticmethod
+    def _model_config(model_name: str):
+        try:
+            path = Path(spacy.util.get_package_path(model_name))
+        except (OSError, ModuleNotFoundError):
+            path = Path(model_name)
+        candidates = [path / "config.cfg", *sorted(path.glob("*/config.cfg"))]
+        config_path = next((candidate for candidate in candidates if candidate.exists()), None)
+        if config_path is None:
+            return None
+        return spacy.util.load_config(config_path, interpolate=False)
+
+    @classmethod
+    def _non_ner_components(cls, model_name: str) -> Set[str]:
+        """
+        Имена компонентов из config.cfg модели, которые можно исключить: все,
+        кроме выставляющих сущности и эмбеддингов, которые слушает их listener.
+        """
+        config = cls._model_config(model_name)
+        if config is None:
+            logger.warning(f"Не найден config.cfg модели {model_name}, загружаю все компоненты")
+            return set()
+
+        components = config["components"]
+        pipeline = config["nlp"]["pipeline"]
+        factories = {name: components.get(name, {}).get("factory", name) for name in pipeline}
+        keep = {name for name in pipeline if factories[name] in ENTITY_FACTORIES}
+
+        for name in list(keep):
+            for upstream in cls._listener_upstreams(components.get(name, {})):
+                if upstream == "*":
+                    keep.update(n for n in pipeline if factories[n] in EMBEDDING_FACTORIES)
+                else:
+                    keep.add(upstream)
+        return set(pipeline) - keep
+
+    @classmethod
+    def _listener_upstreams(cls, config) -> List[str]:
+        if not isinstance(config, dict):
+            return []
+        upstreams = []
+        if "Listener" in str(config.get("@architectures", "")):
+            upstreams.append(config.get("upstream", "*"))
+        for value in config.values():
+            upstreams.extend(cls._listener_upstreams(value))
+        return upstreams
 
     def _ensure_model_installed(self, model_name: str):
+        if Path(model_name).exists():
+            # Модель из локального каталога
+            return
         try:
             spacy.util.get_package_path(model_name)
         except (OSError, ModuleNotFoundError):
@@ -28,7 +109,45 @@ class SpacyNERModel(BaseNERModel):
             logger.info(f"Модель {model_name} успешно установлена.")
 
     def predict_entities(self, text: str) -> List[Entity]:
-        doc_spacy = self.nlp(text)
+        return self._doc_to_entities(self.nlp(text))
+
+    def predict_batch(self, texts: List[str]) -> List[List[Entity]]:
+        return [
+            self._doc_to_entities(doc_spacy)
+            for doc_spacy in self.nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process)
+        ]
+
+    def benchmark_components(self, texts: List[str]) -> Dict[str, float]:
+        """
+        Время каждого компонента полного пайплайна модели на texts и общее время
+        полного и текущего (ner_only) пайплайна, в секундах.
+        """
+        full_nlp = spacy.load(self.model_name)
+        timings: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        docs = [full_nlp.make_doc(text) for text in texts]
+        timings["tokenizer"] = time.perf_counter() - start
+        for name, component in full_nlp.pipeline:
+            start = time.perf_counter()
+            docs = list(component.pipe(docs, batch_size=self.batch_size))
+            timings[name] = time.perf_counter() - start
+        timings["full_pipeline"] = sum(timings.values())
+
+        start = time.perf_counter()
+        for _ in self.nlp.pipe(texts, batch_size=self.batch_size):
+            pass
+        timings["current_pipeline"] = time.perf_counter() - start
+
+        lines = [f"Компоненты {self.model_name} ({len(texts)} текстов):"]
+        for name, elapsed in timings.items():
+            lines.append(f"  {name}: {elapsed:.3f} сек")
+        lines.append(f"  активные компоненты: {', '.join(self.nlp.pipe_names)}")
+        logger.info("\n".join(lines))
+        return timings
+
+    @staticmethod
+    def _doc_to_entities(doc_spacy) -> List[Entity]:
         result_entities = []
         for ent in doc_spacy.ents:
             e = Entity(
@@ -40,8 +159,16 @@ class SpacyNERModel(BaseNERModel):
             result_entities.append(e)
         return result_entities
 
+    def init_kwargs(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "batch_size": self.batch_size,
+            "ner_only": self.ner_only,
+            "n_process": self.n_process,
+            **self.load_kwargs
+        }
+
     def change_model(self, model_name: str):
         if self.model_name != model_name:
             self.model_name = model_name
-            self._ensure_model_installed(model_name)
-            self.nlp = spacy.load(model_name)
+            self._load(model_name)
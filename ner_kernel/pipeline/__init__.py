@@ -1 +1,4 @@
 from .pipeline import Pipeline
+from .chunker import TextChunker
+from .checkpoint import CheckpointStore
+from .comparison import ModelComparison
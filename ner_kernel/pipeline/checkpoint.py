@@ -0,0 +1,160 @@
+import hashlib
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..instance import Document, Entity, EntityTable
+from ..models import BaseNERModel
+
+
+class CheckpointStore:
+    """
+    SQLite-хранилище результатов по документам. Предсказания хранятся по ключу
+    (хэш plaintext, модель + версия), счетчики TP/FP/FN - дополнительно по ключу
+    оценки (стандартизованная разметка и tolerance). Прерванный прогон
+    продолжается с места остановки, а повторный считает только новые документы.
+    """
+
+    # Ограничение SQLite на число параметров в одном запросе
+    _QUERY_CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "doc_hash TEXT NOT NULL, model_key TEXT NOT NULL, entities TEXT NOT NULL, "
+            "PRIMARY KEY (doc_hash, model_key))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS counts ("
+            "doc_hash TEXT NOT NULL, model_key TEXT NOT NULL, eval_key TEXT NOT NULL, "
+            "counts TEXT NOT NULL, PRIMARY KEY (doc_hash, model_key, eval_key))"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def document_hash(doc: Document) -> str:
+        return hashlib.sha256(doc.plaintext.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _digest(payload: bytes) -> str:
+        return hashlib.sha256(payload).hexdigest()[:16]
+
+    @staticmethod
+    def model_key(
+        model: BaseNERModel,
+        version: Optional[str] = None,
+        run_config: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Имя модели плюс явная версия, хэш аргументов конструктора (кроме
+        NON_PREDICTIVE_KWARGS модели) или, для обученных моделей без init_kwargs
+        (CRF, HMM), хэш их обученного состояния - переобученная модель получает
+        новый ключ. run_config -
+        настройки прогона, влияющие на предсказания (режим длинных текстов, окно).
+        """
+        if version is None:
+            init_kwargs = model.init_kwargs()
+            if init_kwargs is None:
+                fingerprint = model.state_fingerprint()
+                if fingerprint is None:
+                    raise ValueError(
+                        f"Для модели {model.model_name} без init_kwargs и хэша состояния нужно указать model_version"
+                    )
+                version = "state-" + fingerprint[:16]
+            else:
+                # Смена размера пакета и т.п. не должна сбрасывать сохраненные предсказания
+                predictive = {
+                    name: value for name, value in init_kwargs.items()
+                    if name not in model.NON_PREDICTIVE_KWARGS
+                }
+                config = json.dumps(predictive, sort_keys=True, default=str)
+                version = CheckpointStore._digest(config.encode("utf-8"))
+        key = f"{type(model).__name__}:{model.model_name}:{version}"
+        if run_config:
+            key += ":" + CheckpointStore._digest(json.dumps(run_config, sort_keys=True, default=str).encode("utf-8"))
+        return key
+
+    @staticmethod
+    def _markup_rows(markup) -> List[Tuple[str, int, int, str]]:
+        if isinstance(markup, EntityTable):
+            return list(zip(markup.entity_labels().tolist(), markup.starts.tolist(), markup.ends.tolist(), markup.texts()))
+        return [(ent.entity, ent.start_offset, ent.end_offset, ent.text) for ent in markup]
+
+    @staticmethod
+    def evaluation_key(doc: Document, config: Dict) -> str:
+        """Хэш уже стандартизованной разметки (gold и pred) и настроек валидатора"""
+        gold = [row[:3] for row in CheckpointStore._markup_rows(doc.gold_markup)]
+        pred = [row[:3] for row in CheckpointStore._markup_rows(doc.pred_markup)]
+        payload = json.dumps({"gold": gold, "pred": pred, **config}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _select(self, query: str, doc_hashes: List[str], model_key: str) -> List[Tuple]:
+        rows = []
+        unique_hashes = list(set(doc_hashes))
+        for start in range(0, len(unique_hashes), self._QUERY_CHUNK):
+            part = unique_hashes[start:start + self._QUERY_CHUNK]
+            placeholders = ",".join("?" * len(part))
+            rows.extend(self._db.execute(query.format(placeholders=placeholders), (model_key, *part)))
+        return rows
+
+    def load_predictions(self, doc_hashes: List[str], model_key: str) -> Dict[str, List[Entity]]:
+        rows = self._select(
+            "SELECT doc_hash, entities FROM predictions "
+            "WHERE model_key = ? AND doc_hash IN ({placeholders})",
+            doc_hashes, model_key
+        )
+        return {
+            doc_hash: [Entity(*item) for item in json.loads(entities)]
+            for doc_hash, entities in rows
+        }
+
+    def save_predictions(self, doc_hashes: Iterable[str], docs: Iterable[Document], model_key: str):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO predictions (doc_hash, model_key, entities) VALUES (?, ?, ?)",
+            [
+                (doc_hash, model_key, json.dumps(self._markup_rows(doc.pred_markup), ensure_ascii=False))
+                for doc_hash, doc in zip(doc_hashes, docs)
+            ]
+        )
+        self._db.commit()
+
+    def load_counts(
+        self,
+        doc_hashes: List[str],
+        model_key: str,
+        eval_keys: List[str]
+    ) -> Dict[Tuple[str, str], Dict[str, List[int]]]:
+        """Счетчики по паре (doc_hash, eval_key); eval_keys соответствуют doc_hashes"""
+        wanted = set(zip(doc_hashes, eval_keys))
+        rows = self._select(
+            "SELECT doc_hash, eval_key, counts FROM counts "
+            "WHERE model_key = ? AND doc_hash IN ({placeholders})",
+            doc_hashes, model_key
+        )
+        return {
+            (doc_hash, eval_key): json.loads(counts)
+            for doc_hash, eval_key, counts in rows
+            if (doc_hash, eval_key) in wanted
+        }
+
+    def save_counts(
+        self,
+        doc_hashes: List[str],
+        model_key: str,
+        eval_keys: List[str],
+        counts: List[Dict[str, List[int]]]
+    ):
+        self._db.executemany(
+            "INSERT OR REPLACE INTO counts (doc_hash, model_key, eval_key, counts) VALUES (?, ?, ?, ?)",
+            [
+                (doc_hash, model_key, eval_key, json.dumps(doc_counts, ensure_ascii=False))
+                for doc_hash, eval_key, doc_counts in zip(doc_hashes, eval_keys, counts)
+            ]
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
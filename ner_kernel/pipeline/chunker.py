@@ -0,0 +1,156 @@
+from typing import Any, Dict, List, Tuple
+
+from ..instance import Entity
+from ..models import BaseNERModel
+
+
+class TextChunker:
+    """
+    Нарезка длинного текста на перекрывающиеся окна и сшивка предсказаний обратно.
+    Без tokenizer окно и перекрытие задаются в символах, с tokenizer
+    (быстрый токенизатор Hugging Face) - в токенах модели.
+    """
+
+    def __init__(self, window: int = 2000, overlap: int = 200, tokenizer=None):
+        if overlap >= window:
+            raise ValueError("Перекрытие должно быть меньше размера окна.")
+        self.window = window
+        self.overlap = overlap
+        self.tokenizer = tokenizer
+
+    @classmethod
+    def for_model(cls, model: BaseNERModel) -> "TextChunker":
+        """
+        Нарезка по умолчанию для модели: у трансформеров (HFNERModel) окно
+        считается в токенах, чтобы не превысить лимит в 512, у остальных - в символах.
+        Проверяем атрибут, чтобы не импортировать transformers ради isinstance.
+        """
+        tokenizer = getattr(model, "tokenizer", None)
+        if tokenizer is not None:
+            return cls(window=500, overlap=64, tokenizer=tokenizer)
+        return cls()
+
+    def config(self) -> Dict[str, Any]:
+        """Настройки нарезки, от которых зависят предсказания (для ключей контрольных точек)"""
+        unit = "chars"
+        if self.tokenizer is not None:
+            unit = "tokens:" + str(getattr(self.tokenizer, "name_or_path", type(self.tokenizer).__name__))
+        return {"window": self.window, "overlap": self.overlap, "unit": unit}
+
+    def chunk(self, text: str) -> List[Tuple[int, int]]:
+        """Возвращает границы окон (start, end) в символах исходного текста"""
+        if self.tokenizer is not None:
+            return self._chunk_by_tokens(text)
+        return self._chunk_by_chars(text)
+
+    def _chunk_by_chars(self, text: str) -> List[Tuple[int, int]]:
+        spans = []
+        start = 0
+        while start < len(text):
+            end = min(start + self.window, len(text))
+            if end < len(text):
+                end = self._find_break(text, start + self.window // 2, end)
+            spans.append((start, end))
+            if end == len(text):
+                break
+
+            next_start = max(end - self.overlap, start + 1)
+            # Не начинаем окно с середины слова
+            space = self._find_space(text, next_start, end)
+            start = space + 1 if space != -1 else next_start
+        return spans
+
+    def _chunk_by_tokens(self, text: str) -> List[Tuple[int, int]]:
+        offsets = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True
+        )["offset_mapping"]
+        if not offsets:
+            return [(0, len(text))] if text else []
+
+        spans = []
+        first = 0
+        while first < len(offsets):
+            last = min(first + self.window, len(offsets))
+            # Не разрезаем слово на подтокены: отступаем к началу слова
+            cut = last
+            while last < len(offsets) and cut > first + 1 and offsets[cut][0] == offsets[cut - 1][1]:
+                cut -= 1
+            if cut > first + 1:
+                last = cut
+
+            start = 0 if first == 0 else offsets[first][0]
+            end = len(text) if last == len(offsets) else offsets[last - 1][1]
+            spans.append((start, end))
+            if last == len(offsets):
+                break
+            first = max(last - self.overlap, first + 1)
+        return spans
+
+    @staticmethod
+    def _find_break(text: str, lo: int, hi: int) -> int:
+        sentence_end = max(text.rfind(". ", lo, hi), text.rfind("\n", lo, hi))
+        if sentence_end != -1:
+            return sentence_end + 1
+        space = text.rfind(" ", lo, hi)
+        if space != -1:
+            return space + 1
+        return hi
+
+    @staticmethod
+    def _find_space(text: str, lo: int, hi: int) -> int:
+        positions = [p for p in (text.find(" ", lo, hi), text.find("\n", lo, hi)) if p != -1]
+        return min(positions) if positions else -1
+
+    def predict_text(self, model: BaseNERModel, text: str) -> List[Entity]:
+        return self.predict_texts(model, [text])[0]
+
+    def predict_texts(self, model: BaseNERModel, texts: List[str]) -> List[List[Entity]]:
+        """Окна всех текстов предсказываются одним пакетным вызовом модели"""
+        layouts = [self.chunk(text) for text in texts]
+        chunk_texts = [
+            text[start:end]
+            for text, spans in zip(texts, layouts)
+            for start, end in spans
+        ]
+        predictions = model.predict_batch(chunk_texts)
+
+        result = []
+        position = 0
+        for text, spans in zip(texts, layouts):
+            result.append(self.stitch(text, spans, predictions[position:position + len(spans)]))
+            position += len(spans)
+        return result
+
+    @staticmethod
+    def stitch(
+        text: str,
+        spans: List[Tuple[int, int]],
+        chunk_entities: List[List[Entity]]
+    ) -> List[Entity]:
+        """
+        Переводит смещения сущностей окон в смещения исходного текста.
+        Каждому окну принадлежит участок до середины перекрытия с соседями,
+        сущности вне этого участка и дубликаты отбрасываются.
+        """
+        result: List[Entity] = []
+        seen = set()
+        for k, ((start, end), entities) in enumerate(zip(spans, chunk_entities)):
+            own_start = start if k == 0 else (start + spans[k - 1][1]) // 2
+            own_end = end if k == len(spans) - 1 else (spans[k + 1][0] + end) // 2
+            for ent in entities:
+                ent_start = ent.start_offset + start
+                ent_end = ent.end_offset + start
+                if not own_start <= ent_start < own_end:
+                    continue
+                key = (ent.entity, ent_start, ent_end)
+                if key in seen:
+                    continue
+                seen.add(key)
+                result.append(Entity(
+                    entity=ent.entity,
+                    start_offset=ent_start,
+                    end_offset=ent_end,
+                    text=text[ent_start:ent_end]
+                ))
+        result.sort(key=lambda e: (e.start_offset, e.end_offset))
+        return result
@@ -0,0 +1,153 @@
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+from ..instance import Document, Entity
+from ..logger import logger
+from ..models import BaseNERModel
+from ..standardizer import LabelStandardizer
+from ..validator import NERValidator, ResultSink
+from . import parallel
+from .chunker import TextChunker
+from .pipeline import Pipeline
+
+if TYPE_CHECKING:
+    from ..dataloader import DataLoader
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def _run_model(
+    payload: Tuple,
+    documents: List[Document],
+    chunker: Optional[TextChunker],
+    threads_per_worker: int
+) -> Tuple[List[List[Entity]], Dict[str, float]]:
+    start = time.perf_counter()
+    docs, load_time, predict_time = parallel.predict_documents(payload, documents, chunker, threads_per_worker)
+    resources = {
+        "load_sec": load_time,
+        "predict_sec": predict_time,
+        "wall_time_sec": time.perf_counter() - start,
+        "docs_per_sec": len(docs) / max(predict_time, 1e-9),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+    return [doc.pred_markup for doc in docs], resources
+
+
+class ModelComparison:
+    """
+    Сравнение нескольких моделей на одном корпусе: корпус загружается один раз,
+    каждая модель работает в отдельном процессе (не более max_workers
+    одновременно), затем все предсказания оцениваются NERValidator. Результат -
+    results_dict для NERVisualizer.create_dashboard, у каждой модели
+    дополнительно есть ключ "resources" со временем и пиковой памятью процесса.
+    Процессы стартуют через spawn, поэтому вызывающий скрипт должен быть
+    защищен if __name__ == "__main__".
+    """
+
+    def __init__(
+        self,
+        models: Dict[str, BaseNERModel],
+        validator: Optional[NERValidator] = None,
+        standardizer: Optional[LabelStandardizer] = None,
+        dataset_name: Optional[str] = None,
+        long_text: bool = False,
+        chunker: Optional[TextChunker] = None,
+        max_workers: Optional[int] = None,
+        threads_per_worker: int = 1
+    ):
+        self.validator = validator or NERValidator()
+        self.pipelines = {
+            name: Pipeline(
+                model, standardizer=standardizer, validator=self.validator,
+                dataset_name=dataset_name, long_text=long_text, chunker=chunker
+            )
+            for name, model in models.items()
+        }
+        self.standardizer = standardizer
+        self.dataset_name = dataset_name
+        self.long_text = long_text
+        # Без явного chunker у каждой модели своя нарезка (TextChunker.for_model)
+        self.chunker = chunker
+        self.max_workers = max_workers or len(models)
+        self.threads_per_worker = threads_per_worker
+
+    def run(
+        self,
+        corpus: Union["DataLoader", List[Document]],
+        sink: Optional[ResultSink] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        documents = corpus if isinstance(corpus, list) else corpus.run()
+        if self.standardizer and self.dataset_name:
+            documents = next(iter(self.pipelines.values())).standardize_input(documents)
+        if not self.long_text and any(p.model.tokenized_input for p in self.pipelines.values()):
+            # Токенизация один раз в родительском процессе, воркеры получают ее вместе с документами
+            for doc in documents:
+                doc.tokens()
+
+        context = multiprocessing.get_context("spawn")
+        # max_tasks_per_child=1: каждая модель в свежем процессе, пиковая память не смешивается
+        with parallel.limited_threads(self.threads_per_worker), ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=context, max_tasks_per_child=1
+        ) as pool:
+            futures = {
+                name: pool.submit(
+                    _run_model,
+                    parallel.model_payload(pipeline.model),
+                    documents,
+                    pipeline.chunker if self.long_text else None,
+                    self.threads_per_worker
+                )
+                for name, pipeline in self.pipelines.items()
+            }
+
+            results_dict = {}
+            for name, future in futures.items():
+                predictions, resources = future.result()
+                results_dict[name] = self._evaluate(name, documents, predictions, sink)
+                results_dict[name]["resources"] = resources
+
+        self._log_summary(results_dict)
+        return results_dict
+
+    def _evaluate(
+        self,
+        name: str,
+        documents: List[Document],
+        predictions: List[List[Entity]],
+        sink: Optional[ResultSink]
+    ) -> Dict[str, Any]:
+        pipeline = self.pipelines[name]
+        docs = [
+            Document(
+                name=doc.name,
+                text=doc.text,
+                plaintext=doc.plaintext,
+                gold_markup=doc.gold_markup,
+                pred_markup=predicted,
+                metadata=doc.metadata
+            ) for doc, predicted in zip(documents, predictions)
+        ]
+        if self.standardizer and self.standardizer.model_mappings[pipeline.model.model_name]:
+            docs = pipeline.standardize_output(docs)
+        return self.validator.evaluate(docs, sink=sink, model_name=name)
+
+    @staticmethod
+    def _log_summary(results_dict: Dict[str, Dict[str, Any]]):
+        lines = ["Сравнение моделей:"]
+        for name, results in results_dict.items():
+            resources = results["resources"]
+            lines.append(
+                f"  {name}: micro F1 {results['micro_avg']['f1']:.4f}, "
+                f"{resources['wall_time_sec']:.2f} сек, {resources['docs_per_sec']:.1f} док/сек, "
+                f"пик памяти {resources['peak_rss_mb']:.0f} МБ"
+            )
+        logger.info("\n".join(lines))
@@ -0,0 +1,138 @@
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..instance import Document
+from ..models import BaseNERModel
+from ..logger import logger
+from .chunker import TextChunker
+
+# Состояние процесса-воркера, заполняется в _init_worker один раз
+_worker_model: Optional[BaseNERModel] = None
+_worker_chunker: Optional[TextChunker] = None
+
+
+def model_payload(model: BaseNERModel) -> Tuple:
+    """
+    Предобученные обертки пересоздаются в воркере по аргументам конструктора,
+    обученные (CRF, HMM) сериализуются один раз и передаются через initargs.
+    """
+    init_kwargs = model.init_kwargs()
+    if init_kwargs is None:
+        return ("pickle", pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    return ("init", type(model), init_kwargs)
+
+
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+@contextmanager
+def limited_threads(threads_per_worker: int) -> Iterator[None]:
+    """
+    Переменные окружения для числа потоков на время работы пула. Их нужно
+    выставить до старта процессов: OpenMP/MKL читают их при импорте torch/numpy,
+    который при spawn может случиться еще до initializer.
+    """
+    previous = {name: os.environ.get(name) for name in THREAD_ENV_VARS}
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads_per_worker)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _init_worker(payload: Tuple, chunker: Optional[TextChunker], threads_per_worker: int):
+    global _worker_model, _worker_chunker
+    # Без ограничения каждый воркер torch/numpy займет все ядра
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads_per_worker)
+    if "torch" in sys.modules:
+        # torch уже импортирован (например, главным модулем при spawn) и окружение не перечитает
+        sys.modules["torch"].set_num_threads(threads_per_worker)
+
+    if payload[0] == "pickle":
+        _worker_model = pickle.loads(payload[1])
+    else:
+        _, model_class, init_kwargs = payload
+        _worker_model = model_class(**init_kwargs)
+    _worker_chunker = chunker
+
+
+def _predict_chunk(docs: List[Document]) -> Tuple[List[Document], int, float]:
+    start = time.perf_counter()
+    if _worker_chunker is not None:
+        predictions = _worker_chunker.predict_texts(_worker_model, [doc.plaintext for doc in docs])
+        for doc, predicted in zip(docs, predictions):
+            doc.pred_markup = predicted
+    else:
+        docs = _worker_model.predict_documents(docs)
+    return docs, os.getpid(), time.perf_counter() - start
+
+
+def predict_documents(
+    payload: Tuple,
+    documents: List[Document],
+    chunker: Optional[TextChunker] = None,
+    threads_per_worker: int = 1
+) -> Tuple[List[Document], float, float]:
+    """
+    Загрузка модели по model_payload и предсказание документов в текущем
+    процессе (обычно отдельном). Возвращает документы, время загрузки модели
+    и время предсказания в секундах.
+    """
+    start = time.perf_counter()
+    _init_worker(payload, chunker, threads_per_worker)
+    load_time = time.perf_counter() - start
+    docs, _, predict_time = _predict_chunk(documents)
+    return docs, load_time, predict_time
+
+
+def predict_parallel(
+    model: BaseNERModel,
+    documents: List[Document],
+    n_workers: int,
+    chunk_size: int = 64,
+    chunker: Optional[TextChunker] = None,
+    threads_per_worker: int = 1
+) -> List[Document]:
+    """
+    Предсказание корпуса пулом процессов: модель загружается один раз на воркер,
+    документы раздаются пачками по chunk_size, порядок результата сохраняется.
+    Процессы стартуют через spawn, поэтому вызывающий скрипт должен быть
+    защищен if __name__ == "__main__".
+    """
+    chunks = [documents[i:i + chunk_size] for i in range(0, len(documents), chunk_size)]
+    # spawn: fork процесса с уже запущенными потоками torch может зависнуть
+    context = multiprocessing.get_context("spawn")
+    worker_stats: Dict[int, List[float]] = defaultdict(lambda: [0, 0.0])
+
+    result = []
+    start = time.perf_counter()
+    with limited_threads(threads_per_worker), ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(model_payload(model), chunker, threads_per_worker)
+    ) as pool:
+        for docs, pid, elapsed in pool.map(_predict_chunk, chunks):
+            result.extend(docs)
+            worker_stats[pid][0] += len(docs)
+            worker_stats[pid][1] += elapsed
+    total_time = time.perf_counter() - start
+
+    lines = [f"Параллельное предсказание: {len(result)} документов за {total_time:.2f} сек"]
+    for pid, (n_docs, elapsed) in sorted(worker_stats.items()):
+        lines.append(f"  воркер {pid}: {n_docs} документов, {n_docs / max(elapsed, 1e-9):.1f} док/сек")
+    logger.info("\n".join(lines))
+    return result
@@ -1,9 +1,18 @@
-from typing import Dict, List, Optional
-from ..instance import Document, Entity
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from ..instance import Document, Entity, EntityTable
+from ..logger import logger
 from ..models import BaseNERModel
-from ..validator import NERValidator
+from ..validator import NERValidator, ResultSink
 from ..standardizer import LabelStandardizer
 from ..utils.resource_logger import log_resources
+from .checkpoint import CheckpointStore
+from .chunker import TextChunker
+from .parallel import predict_parallel
+from .stages import run_stages
+
+# Ключ metadata с датасетом и версией маппинга, уже примененного к gold-разметке
+GOLD_MAPPING_KEY = "gold_label_mapping"
 
 
 class Pipeline:
@@ -13,98 +22,250 @@ class Pipeline:
         standardizer: Optional[LabelStandardizer] = None,
         validator: Optional[NERValidator] = None,
         dataset_name: Optional[str] = None,
-        long_text: bool = False
+        long_text: bool = False,
+        chunker: Optional[TextChunker] = None,
+        n_workers: int = 1,
+        chunk_size: int = 64,
+        checkpoint: Optional[CheckpointStore] = None,
+        model_version: Optional[str] = None,
+        columnar: bool = False
     ):
         self.model = model
         self.validator = validator
         self.standardizer = standardizer
         self.dataset_name = dataset_name
         self.long_text = long_text
+        self.chunker = chunker or TextChunker.for_model(model)
+        # n_workers > 1 - предсказание пулом процессов пачками по chunk_size документов
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        # Предсказания и счетчики сохраняются по хэшу документа: прерванный
+        # прогон продолжается с места остановки
+        self.checkpoint = checkpoint
+        self.model_version = model_version
+        # Разметка результата хранится в EntityTable вместо списков Entity
+        self.columnar = columnar
 
     @log_resources
     def run(self, documents: List[Document]) -> List[Document]:
         if self.standardizer and self.dataset_name:
-            documents = self._standardize_input(documents)
+            documents = self.standardize_input(documents)
 
-        if self.long_text:
-            processed_docs = []
-            for doc in documents:
-                sentences = doc.text.split(" . ")
-                current_offset = 0
-                for sentence in sentences:
-                    if sentence.strip():
-                        temp_doc = Document(
-                            name=doc.name,
-                            text=sentence + " . ",
-                            plaintext=sentence + " . ",
-                            gold_markup=[],
-                            pred_markup=[],
-                            metadata=doc.metadata
-                        )
-                        processed_temp_doc = self.model.predict_document(
-                            temp_doc)
-                        for ent in processed_temp_doc.pred_markup:
-                            ent.start_offset += current_offset
-                            ent.end_offset += current_offset
-                        doc.pred_markup.extend(processed_temp_doc.pred_markup)
-                        current_offset += len(sentence) + 3
-                processed_docs.append(doc)
+        if self.checkpoint:
+            processed_docs = self._predict_with_checkpoint(documents)
         else:
-            processed_docs = [self.model.predict_document(
-                doc) for doc in documents]
+            processed_docs = self._predict(documents)
+        if self.columnar:
+            processed_docs = self._to_columnar(processed_docs)
 
         if self.standardizer and self.standardizer.model_mappings[self.model.model_name]:
-            processed_docs = self._standardize_output(processed_docs)
+            processed_docs = self.standardize_output(processed_docs)
         return processed_docs
 
-    def _standardize_input(self, documents: List[Document]) -> List[Document]:
-        return [
-            Document(
-                name=doc.name,
-                text=doc.text,
-                plaintext=doc.plaintext,
-                gold_markup=[
-                    Entity(
-                        entity=self.standardizer.map_dataset_label(
-                            dataset_name=self.dataset_name,
-                            original_label=ent.entity
-                        ),
-                        start_offset=ent.start_offset,
-                        end_offset=ent.end_offset,
-                        text=ent.text
-                    ) for ent in doc.gold_markup
-                ],
-                pred_markup=doc.pred_markup,
-                metadata=doc.metadata
-            ) for doc in documents
-        ]
-
-    def _standardize_output(self, documents: List[Document]) -> List[Document]:
-        return [
-            Document(
-                name=doc.name,
-                text=doc.text,
-                plaintext=doc.plaintext,
-                gold_markup=doc.gold_markup,
-                pred_markup=[
-                    Entity(
-                        entity=self.standardizer.map_model_label(
-                            model_name=self.model.model_name,
-                            original_label=ent.entity
-                        ),
-                        start_offset=ent.start_offset,
-                        end_offset=ent.end_offset,
-                        text=ent.text
-                    ) for ent in doc.pred_markup
-                ],
-                metadata=doc.metadata
-            ) for doc in documents
-        ]
-
-    def validate(self, documents: List[Document]) -> Dict[str, float]:
+    def stream(
+        self,
+        documents: Iterable[Document],
+        batch_size: Optional[int] = None,
+        queue_size: int = 4,
+        sink: Optional[Callable[[Document], None]] = None
+    ) -> Iterator[Document]:
+        """
+        Потоковый режим: документы читаются из итератора (например,
+        DataLoader.iter_documents) пачками по batch_size, а загрузка, предсказание,
+        стандартизация и запись в sink идут параллельно в отдельных потоках.
+        Документы выдаются по мере готовности, память не зависит от размера корпуса.
+        """
+        batch_size = batch_size or self.model.batch_size
+        iterator = iter(documents)
+        batches = iter(lambda: list(islice(iterator, batch_size)), [])
+
+        def predict(batch: List[Document]) -> List[Document]:
+            if self.standardizer and self.dataset_name:
+                batch = self.standardize_input(batch)
+            if self.long_text:
+                batch = self._predict_long_documents(batch)
+            else:
+                batch = self.model.predict_documents(batch)
+            return self._to_columnar(batch) if self.columnar else batch
+
+        def finish(batch: List[Document]) -> List[Document]:
+            if self.standardizer and self.standardizer.model_mappings[self.model.model_name]:
+                batch = self.standardize_output(batch)
+            if sink:
+                for doc in batch:
+                    sink(doc)
+            return batch
+
+        for batch in run_stages(batches, [predict, finish], queue_size=queue_size):
+            yield from batch
+
+    def _predict(self, documents: List[Document]) -> List[Document]:
+        if self.n_workers > 1:
+            return predict_parallel(
+                self.model, documents, self.n_workers, self.chunk_size,
+                chunker=self.chunker if self.long_text else None
+            )
+        if self.long_text:
+            return self._predict_long_documents(documents)
+        return self.model.predict_documents(documents)
+
+    def _checkpoint_model_key(self) -> str:
+        # Нарезка на окна меняет предсказания, поэтому ее настройки входят в ключ
+        run_config = {"long_text": True, "chunker": self.chunker.config()} if self.long_text else None
+        return self.checkpoint.model_key(self.model, self.model_version, run_config)
+
+    def _predict_with_checkpoint(self, documents: List[Document]) -> List[Document]:
+        """
+        Документы с сохраненным предсказанием не отправляются в модель, остальные
+        предсказываются порциями, и каждая порция сразу записывается в хранилище.
+        """
+        model_key = self._checkpoint_model_key()
+        doc_hashes = [self.checkpoint.document_hash(doc) for doc in documents]
+        stored = self.checkpoint.load_predictions(doc_hashes, model_key)
+
+        pending = []
+        for doc, doc_hash in zip(documents, doc_hashes):
+            if doc_hash in stored:
+                doc.pred_markup = stored[doc_hash]
+            else:
+                pending.append((doc, doc_hash))
+        if stored:
+            logger.info(
+                f"Контрольная точка: восстановлено {len(documents) - len(pending)} "
+                f"из {len(documents)} документов для {model_key}"
+            )
+
+        portion = self.chunk_size * max(self.n_workers, 1)
+        for start in range(0, len(pending), portion):
+            part = pending[start:start + portion]
+            predicted = self._predict([doc for doc, _ in part])
+            # Пул процессов возвращает копии документов
+            for (doc, _), result in zip(part, predicted):
+                doc.pred_markup = result.pred_markup
+            self.checkpoint.save_predictions(
+                [doc_hash for _, doc_hash in part], [doc for doc, _ in part], model_key
+            )
+        return documents
+
+    def _predict_long_documents(self, documents: List[Document]) -> List[Document]:
+        predictions = self.chunker.predict_texts(
+            self.model, [doc.plaintext for doc in documents]
+        )
+        for doc, predicted in zip(documents, predictions):
+            doc.pred_markup = predicted
+        return documents
+
+    @staticmethod
+    def _to_columnar(documents: List[Document]) -> List[Document]:
+        for doc in documents:
+            doc.gold_markup = EntityTable.from_entities(doc.gold_markup, doc.plaintext)
+            doc.pred_markup = EntityTable.from_entities(doc.pred_markup, doc.plaintext)
+        return documents
+
+    def standardize_input(self, documents: List[Document]) -> List[Document]:
+        """
+        Gold-метки переводятся на месте, исходные метки сохраняются в
+        gold_source_labels. В metadata записываются датасет и версия маппинга:
+        повторный прогон с тем же маппингом документ пропускает, а после
+        изменения маппинга (update_mappings) метки переводятся заново из исходных.
+        """
+        mapping = self.standardizer.compiled_dataset_mapping(self.dataset_name)
+        mapping_tag = f"{self.dataset_name}:{mapping.version}"
+        for doc in documents:
+            if doc.metadata is None:
+                doc.metadata = {}
+            standardized_for = doc.metadata.get(GOLD_MAPPING_KEY)
+            if standardized_for == mapping_tag:
+                continue
+            if standardized_for is None:
+                doc.gold_source_labels = self._gold_labels(doc.gold_markup)
+            else:
+                doc.gold_markup = self._restore_gold(doc, standardized_for)
+            doc.gold_markup = mapping.apply(doc.gold_markup)
+            doc.metadata[GOLD_MAPPING_KEY] = mapping_tag
+        return documents
+
+    @staticmethod
+    def _gold_labels(markup: Union[List[Entity], EntityTable]) -> List[str]:
+        if isinstance(markup, EntityTable):
+            return markup.entity_labels().tolist()
+        return [ent.entity for ent in markup]
+
+    @staticmethod
+    def _restore_gold(doc: Document, standardized_for: str) -> Union[List[Entity], EntityTable]:
+        """Возвращает gold-разметке исходные метки перед переводом другим маппингом"""
+        labels = doc.gold_source_labels
+        if labels is None or len(labels) != len(doc.gold_markup):
+            raise ValueError(
+                f"Gold-разметка документа {doc.name} стандартизована ({standardized_for}), "
+                f"а исходные метки недоступны; загрузите документ заново"
+            )
+        if isinstance(doc.gold_markup, EntityTable):
+            return doc.gold_markup.with_labels(labels)
+        for ent, label in zip(doc.gold_markup, labels):
+            ent.entity = label
+        return doc.gold_markup
+
+    def standardize_output(self, documents: List[Document]) -> List[Document]:
+        # Предсказания свежие после каждого прогона модели, их можно менять на месте
+        mapping = self.standardizer.compiled_model_mapping(self.model.model_name)
+        for doc in documents:
+            doc.pred_markup = mapping.apply(doc.pred_markup)
+        return documents
+
+    def validate(self, documents: List[Document], sink: Optional[ResultSink] = None) -> Dict[str, float]:
+        if not self.validator:
+            raise ValueError("Валидатор не определен")
+        if not self.checkpoint:
+            return self.validator.evaluate(documents, sink=sink, model_name=self.model.model_name)
+
+        model_key = self._checkpoint_model_key()
+        config = {
+            "tolerance": self.validator.tolerance,
+            "match_mode": self.validator.match_mode,
+            "iou_threshold": self.validator.iou_threshold
+        }
+        doc_hashes = [self.checkpoint.document_hash(doc) for doc in documents]
+        eval_keys = [self.checkpoint.evaluation_key(doc, config) for doc in documents]
+        stored = self.checkpoint.load_counts(doc_hashes, model_key, eval_keys)
+
+        document_counts = []
+        missing = []
+        for i, (doc, doc_hash, eval_key) in enumerate(zip(documents, doc_hashes, eval_keys)):
+            counts = stored.get((doc_hash, eval_key))
+            if counts is None:
+                counts = self.validator.count_document(doc)
+                missing.append(i)
+            document_counts.append(counts)
+        if missing:
+            self.checkpoint.save_counts(
+                [doc_hashes[i] for i in missing], model_key,
+                [eval_keys[i] for i in missing], [document_counts[i] for i in missing]
+            )
+
+        return self.validator.evaluate_counts(
+            [doc.name for doc in documents], document_counts,
+            sink=sink, model_name=self.model.model_name
+        )
+
+    def sweep(
+        self,
+        documents: List[Document],
+        tolerances: Optional[List[int]] = None,
+        dataset_mappings: Optional[Dict[str, Optional[Dict[str, str]]]] = None
+    ) -> Dict[Tuple[str, int], Dict[str, any]]:
+        """
+        Перебор tolerance и маппингов меток датасета без повторного прогона модели.
+        Документы должны содержать исходные gold-метки, т.е. быть получены
+        пайплайном без dataset_name.
+        """
         if not self.validator:
             raise ValueError("Валидатор не определен")
-        return self.validator.evaluate(documents)
+        default_label = self.standardizer.default_label if self.standardizer else "MISC"
+        return self.validator.sweep(
+            documents, tolerances=tolerances,
+            label_mappings=dataset_mappings, default_label=default_label
+        )
 
     def update_mappings(
         self,
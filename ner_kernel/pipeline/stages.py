@@ -0,0 +1,87 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List
+
+_END = object()
+
+
+class _StageError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def run_stages(
+    source: Iterable[Any],
+    stages: List[Callable[[Any], Any]],
+    queue_size: int = 4
+) -> Iterator[Any]:
+    """
+    Конвейер из потоков: чтение source и каждая стадия выполняются в своем
+    потоке и связаны очередями размера queue_size, поэтому стадии перекрываются,
+    а в памяти одновременно не больше O(queue_size * число стадий) элементов.
+    Исключение любой стадии пробрасывается потребителю.
+    """
+    stop = threading.Event()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+
+    def put(target: queue.Queue, item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def get(source_queue: queue.Queue) -> Any:
+        while not stop.is_set():
+            try:
+                return source_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def produce():
+        try:
+            for item in source:
+                if not put(queues[0], item):
+                    return
+        except BaseException as e:
+            put(queues[0], _StageError(e))
+            return
+        put(queues[0], _END)
+
+    def consume(func: Callable[[Any], Any], source_queue: queue.Queue, target: queue.Queue):
+        while True:
+            item = get(source_queue)
+            if item is _END or isinstance(item, _StageError):
+                put(target, item)
+                return
+            try:
+                result = func(item)
+            except BaseException as e:
+                put(target, _StageError(e))
+                return
+            if not put(target, result):
+                return
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [
+        threading.Thread(target=consume, args=(func, queues[i], queues[i + 1]), daemon=True)
+        for i, func in enumerate(stages)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            item = get(queues[-1])
+            if item is _END:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -1 +1 @@
-from .standardizer import LabelStandardizer
\ No newline at end of file
+from .standardizer import LabelStandardizer, CompiledLabelMapping
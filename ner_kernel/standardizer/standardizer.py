@@ -1,14 +1,90 @@
-from typing import Dict
+import hashlib
+import json
+import sys
+from typing import Dict, List, Tuple, Union
 from collections import defaultdict
 
+from ..instance import Entity, EntityTable
+
+
+class CompiledLabelMapping:
+    """
+    Скомпилированный маппинг меток: каждая исходная метка один раз переводится
+    в номер итоговой метки в интернированном словаре labels, дальше перевод -
+    одно обращение к словарю. Применяется к разметке на месте.
+    """
+
+    def __init__(self, mapping: Dict[str, str], default_label: str):
+        self.mapping = dict(mapping)
+        self.default_label = default_label
+        # Версия содержимого маппинга: совпадает у одинаковых маппингов
+        payload = json.dumps([sorted(self.mapping.items()), default_label], ensure_ascii=False)
+        self.version = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        self.labels: List[str] = []
+        self._target_ids: Dict[str, int] = {}
+        self._source_ids: Dict[str, int] = {}
+
+    def label_id(self, label: str) -> int:
+        target_id = self._source_ids.get(label)
+        if target_id is None:
+            target = sys.intern(self.mapping.get(label, self.default_label))
+            target_id = self._target_ids.get(target)
+            if target_id is None:
+                target_id = self._target_ids[target] = len(self.labels)
+                self.labels.append(target)
+            self._source_ids[label] = target_id
+        return target_id
+
+    def __call__(self, label: str) -> str:
+        return self.labels[self.label_id(label)]
+
+    def apply(self, markup: Union[List[Entity], EntityTable]) -> Union[List[Entity], EntityTable]:
+        """Список Entity меняется на месте, у EntityTable переводится словарь меток"""
+        if isinstance(markup, EntityTable):
+            return markup.map_labels(self)
+        for ent in markup:
+            ent.entity = self(ent.entity)
+        return markup
+
 
 class LabelStandardizer:
     def __init__(self):
         self.model_mappings = defaultdict(dict)  # {"model_name": {"ORG": "ORG", ...}}
         self.dataset_mappings = defaultdict(dict)
 
+        self._compiled: Dict[Tuple[str, str], CompiledLabelMapping] = {}
         self.default_label = "MISC"
 
+    @property
+    def default_label(self) -> str:
+        return self._default_label
+
+    @default_label.setter
+    def default_label(self, value: str):
+        # Скомпилированные маппинги хранят метку по умолчанию, их нужно пересобрать
+        self._default_label = value
+        self._compiled.clear()
+
+    @classmethod
+    def from_file(cls, path: str) -> "LabelStandardizer":
+        standardizer = cls()
+        standardizer.load_mappings(path)
+        return standardizer
+
+    def load_mappings(self, path: str):
+        """
+        Загрузка маппингов из JSON вида
+        {"default_label": "MISC", "models": {"имя": {...}}, "datasets": {"имя": {...}}}
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if "default_label" in config:
+            self.default_label = config["default_label"]
+        for model_name, mapping in config.get("models", {}).items():
+            self.add_model_mapping(model_name, mapping)
+        for dataset_name, mapping in config.get("datasets", {}).items():
+            self.add_dataset_mapping(dataset_name, mapping)
+
     def map_model_label(self, model_name: str, original_label: str) -> str:
         return self.model_mappings[model_name].get(
             original_label,
@@ -21,8 +97,22 @@ class LabelStandardizer:
             self.default_label
         )
 
+    def compiled_model_mapping(self, model_name: str) -> CompiledLabelMapping:
+        return self._compile("model", model_name, self.model_mappings.get(model_name, {}))
+
+    def compiled_dataset_mapping(self, dataset_name: str) -> CompiledLabelMapping:
+        return self._compile("dataset", dataset_name, self.dataset_mappings.get(dataset_name, {}))
+
+    def _compile(self, kind: str, name: str, mapping: Dict[str, str]) -> CompiledLabelMapping:
+        key = (kind, name)
+        if key not in self._compiled:
+            self._compiled[key] = CompiledLabelMapping(mapping, self.default_label)
+        return self._compiled[key]
+
     def add_model_mapping(self, model_name: str, mapping: Dict[str, str]):
         self.model_mappings[model_name].update(mapping)
+        self._compiled.pop(("model", model_name), None)
 
     def add_dataset_mapping(self, dataset_name: str, mapping: Dict[str, str]):
         self.dataset_mappings[dataset_name].update(mapping)
+        self._compiled.pop(("dataset", dataset_name), None)
@@ -0,0 +1,17 @@
+import importlib
+from typing import Any, Callable, Dict
+
+
+def lazy_attributes(package: str, namespace: Dict[str, Any], exports: Dict[str, str]) -> Callable[[str], Any]:
+    """
+    Возвращает __getattr__ для пакета (PEP 562): модуль с тяжелыми зависимостями
+    (torch, transformers, flair, ...) импортируется при первом обращении к имени.
+    exports: {"HFNERModel": ".hugging_face_model", ...}
+    """
+    def __getattr__(name: str) -> Any:
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name], package), name)
+        namespace[name] = value
+        return value
+    return __getattr__
@@ -0,0 +1,37 @@
+import re
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+# Токен - непрерывная последовательность непробельных символов, как у str.split()
+_TOKEN_PATTERN = re.compile(r"\S+")
+
+
+@dataclass
+class TokenizedText:
+    tokens: List[str]
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+
+def tokenize(text: str) -> TokenizedText:
+    """
+    Токены текста вместе с точными смещениями начала и конца за один проход
+    регулярного выражения; токены совпадают с text.split().
+    """
+    tokens = []
+    starts = []
+    ends = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        tokens.append(match.group())
+        starts.append(match.start())
+        ends.append(match.end())
+    return TokenizedText(
+        tokens=tokens,
+        starts=np.array(starts, dtype=np.int64),
+        ends=np.array(ends, dtype=np.int64)
+    )
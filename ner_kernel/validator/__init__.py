@@ -1,2 +1,11 @@
 from .validator import NERValidator
-from .visualizer import NERVisualizer
+from .results import ResultSink, load_results
+from ..utils.lazy_import import lazy_attributes
+
+# matplotlib/seaborn нужны только для визуализации
+_EXPORTS = {
+    "NERVisualizer": ".visualizer",
+}
+
+__all__ = ["NERValidator", "ResultSink", "load_results", *_EXPORTS]
+__getattr__ = lazy_attributes(__name__, globals(), _EXPORTS)
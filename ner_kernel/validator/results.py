@@ -0,0 +1,195 @@
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from ..instance import Document, EntityTable
+
+# Общая схема строк: kind = "document" (метрики документа), "summary" (итог модели)
+# или "prediction" (разметка документа). Вложенные структуры хранятся как JSON-строки.
+RESULT_COLUMNS = [
+    "model", "kind", "document_id",
+    "precision", "recall", "f1", "support", "tp", "fp", "fn",
+    "label_metrics", "micro_avg", "macro_avg", "entities",
+]
+_JSON_COLUMNS = {"label_metrics", "micro_avg", "macro_avg", "entities"}
+# Колонки документов, которых достаточно для графиков NERVisualizer
+# и бутстрэп-интервалов (tp, fp, fn)
+DOCUMENT_COLUMNS = ["document_id", "precision", "recall", "f1", "support", "tp", "fp", "fn"]
+
+
+def _parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("model", pa.string()), ("kind", pa.string()), ("document_id", pa.string()),
+        ("precision", pa.float64()), ("recall", pa.float64()), ("f1", pa.float64()),
+        ("support", pa.int64()), ("tp", pa.int64()), ("fp", pa.int64()), ("fn", pa.int64()),
+        ("label_metrics", pa.string()), ("micro_avg", pa.string()),
+        ("macro_avg", pa.string()), ("entities", pa.string()),
+    ])
+
+
+def _detect_format(path: str) -> str:
+    return "parquet" if os.path.splitext(path)[1].lower() in (".parquet", ".pq") else "jsonl"
+
+
+class ResultSink:
+    """
+    Инкрементальная запись предсказаний и метрик в JSONL или Parquet.
+    Строки дописываются по мере вычисления, Parquet пишется группами по buffer_size строк.
+    Существующий файл перезаписывается; append=True дописывает в него (только JSONL).
+    """
+
+    def __init__(self, path: str, format: Optional[str] = None, buffer_size: int = 1000, append: bool = False):
+        self.path = path
+        self.format = format or _detect_format(path)
+        self.buffer_size = buffer_size
+        self.append = append
+        self._rows: List[Dict[str, Any]] = []
+
+        if self.format == "parquet":
+            if append:
+                raise ValueError("Дозапись поддерживается только для JSONL")
+            import pyarrow.parquet as pq
+
+            self._schema = _parquet_schema()
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._file = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write_prediction(self, model_name: str, doc: Document):
+        self._write({
+            "model": model_name,
+            "kind": "prediction",
+            "document_id": doc.name,
+            "entities": doc.pred_markup.to_dicts() if isinstance(doc.pred_markup, EntityTable) else [
+                {
+                    "entity": ent.entity,
+                    "start_offset": ent.start_offset,
+                    "end_offset": ent.end_offset,
+                    "text": ent.text
+                } for ent in doc.pred_markup
+            ],
+        })
+
+    def prediction_writer(self, model_name: str) -> Callable[[Document], None]:
+        """Callable для Pipeline.stream(sink=...)"""
+        return lambda doc: self.write_prediction(model_name, doc)
+
+    def write_document_metrics(self, model_name: str, metrics: Dict[str, Any]):
+        self._write({"model": model_name, "kind": "document", **metrics})
+
+    def write_summary(self, model_name: str, results: Dict[str, Any]):
+        self._write({
+            "model": model_name,
+            "kind": "summary",
+            "micro_avg": results.get("micro_avg"),
+            "macro_avg": results.get("macro_avg"),
+            "label_metrics": results.get("label_metrics"),
+        })
+
+    def write_results(self, model_name: str, results: Dict[str, Any]):
+        """Запись готового результата NERValidator.evaluate (например, из stat2.json)"""
+        for metrics in results.get("documents", []):
+            self.write_document_metrics(model_name, metrics)
+        self.write_summary(model_name, results)
+
+    def _write(self, row: Dict[str, Any]):
+        row = {
+            column: json.dumps(row[column], ensure_ascii=False, default=float)
+            if column in _JSON_COLUMNS and row.get(column) is not None else row.get(column)
+            for column in RESULT_COLUMNS
+        }
+        if self.format == "parquet":
+            self._rows.append(row)
+            if len(self._rows) >= self.buffer_size:
+                self.flush()
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False, default=float) + "\n")
+
+    def flush(self):
+        if self.format == "parquet":
+            if self._rows:
+                import pyarrow as pa
+
+                self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self._schema))
+                self._rows = []
+        else:
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self.format == "parquet":
+            self._writer.close()
+        else:
+            self._file.close()
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_rows(path: str, models: Optional[List[str]], kind: List[str], columns: List[str]) -> List[Dict[str, Any]]:
+    if _detect_format(path) == "parquet":
+        import pyarrow.parquet as pq
+
+        filters = [("kind", "in", kind)]
+        if models:
+            filters.append(("model", "in", list(models)))
+        # В файлах, записанных до появления колонок tp/fp/fn, их нет
+        available = set(pq.read_schema(path).names)
+        present = [column for column in columns if column in available]
+        data = pq.read_table(path, columns=present, filters=filters).to_pydict()
+        return [
+            {column: row.get(column) for column in columns}
+            for row in (dict(zip(present, values)) for values in zip(*(data[column] for column in present)))
+        ]
+
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            row = json.loads(line)
+            if row["kind"] in kind and (not models or row["model"] in models):
+                rows.append({column: row.get(column) for column in columns})
+    return rows
+
+
+def load_results(
+    path: str,
+    models: Optional[List[str]] = None,
+    include_documents: bool = True,
+    document_columns: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Читает результаты в формате results_dict для NERVisualizer. Из Parquet
+    читаются только нужные колонки и модели; по умолчанию у документов
+    не загружаются метрики по меткам. Если документ модели записан несколько
+    раз (дозапись повторного прогона), берется последняя запись.
+    """
+    document_columns = document_columns or DOCUMENT_COLUMNS
+
+    results: Dict[str, Dict[str, Any]] = {}
+    summary_columns = ["model", "micro_avg", "macro_avg", "label_metrics"]
+    for row in _read_rows(path, models, ["summary"], summary_columns):
+        model_results = results.setdefault(row["model"], {"documents": []})
+        for key in summary_columns[1:]:
+            model_results[key] = json.loads(row[key]) if row[key] else {}
+
+    if include_documents:
+        read_columns = ["model", *document_columns]
+        if "document_id" not in document_columns:
+            read_columns.append("document_id")
+        documents: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for row in _read_rows(path, models, ["document"], read_columns):
+            model_documents = documents.setdefault(row["model"], {})
+            # pop: повторная запись документа встает на место по последнему прогону
+            model_documents.pop(row["document_id"], None)
+            model_documents[row["document_id"]] = {
+                column: json.loads(row[column]) if column in _JSON_COLUMNS and row[column] else row[column]
+                for column in document_columns
+            }
+        for model_name, model_documents in documents.items():
+            results.setdefault(model_name, {"documents": []})["documents"] = list(model_documents.values())
+    return results
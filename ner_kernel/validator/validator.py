@@ -1,128 +1,455 @@
-from typing import List, Dict, Tuple, Set, Optional
-from collections import defaultdict
+import math
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Tuple, Set, Optional, Union
 
-from sklearn.metrics import precision_recall_fscore_support
 import numpy as np
 
-from ..instance import Document, Entity
+from ..instance import Document, Entity, EntityTable
+from .results import ResultSink
 
 
 class NERValidator:
-    def __init__(self, tolerance: int = 5):
+    MATCH_MODES = ("start", "exact", "overlap")
+
+    def __init__(self, tolerance: int = 5, match_mode: str = "start", iou_threshold: float = 0.5):
+        """
+        match_mode: "start" - совпадение метки и начала с точностью до tolerance,
+        "exact" - совпадение метки и границ, "overlap" - совпадение метки
+        и IoU границ не ниже iou_threshold.
+        """
+        if match_mode not in self.MATCH_MODES:
+            raise ValueError(f"Неизвестный режим сопоставления: {match_mode}")
+        # При пороге 0 парой считались бы и непересекающиеся сущности, а индекс
+        # по началу ищет кандидатов только среди пересекающихся
+        if not 0 < iou_threshold <= 1:
+            raise ValueError(f"iou_threshold должен быть в (0, 1], получено {iou_threshold}")
         self.tolerance = tolerance
+        self.match_mode = match_mode
+        self.iou_threshold = iou_threshold
 
     def _compare_entities(self, gold_ent: Entity, pred_ent: Entity) -> bool:
         if gold_ent.entity != pred_ent.entity:
             return False
-        if abs(gold_ent.start_offset - pred_ent.start_offset) > self.tolerance:
+        return self._compare_spans(
+            gold_ent.start_offset, gold_ent.end_offset, pred_ent.start_offset, pred_ent.end_offset
+        )
+
+    def _compare_spans(self, gold_start: int, gold_end: int, pred_start: int, pred_end: int) -> bool:
+        if self.match_mode == "exact":
+            return (gold_start, gold_end) == (pred_start, pred_end)
+        if self.match_mode == "overlap":
+            return self._iou(gold_start, gold_end, pred_start, pred_end) >= self.iou_threshold
+        if abs(gold_start - pred_start) > self.tolerance:
             return False
         return True
 
-    def _match_entities(self, gold_entities: List[Entity], pred_entities: List[Entity]) -> List[Tuple[Optional[Entity], Optional[Entity]]]:
-        all_pairs = []
-        matched_pred_indices = set()
+    @staticmethod
+    def _iou(gold_start: int, gold_end: int, pred_start: int, pred_end: int) -> float:
+        intersection = min(gold_end, pred_end) - max(gold_start, pred_start)
+        union = max(gold_end, pred_end) - min(gold_start, pred_start)
+        if union <= 0:
+            return 1.0 if gold_start == pred_start else 0.0
+        return max(intersection, 0) / union
 
-        for gold in gold_entities:
-            matched_index = None
-            for i, pred in enumerate(pred_entities):
-                if i not in matched_pred_indices and self._compare_entities(gold, pred):
-                    matched_index = i
-                    break
+    @staticmethod
+    def _markup_columns(markup: Union[List[Entity], EntityTable]) -> Tuple[List[str], List[int], List[int]]:
+        """Метки, начала и концы сущностей; EntityTable читается без создания Entity"""
+        if isinstance(markup, EntityTable):
+            return markup.entity_labels().tolist(), markup.starts.tolist(), markup.ends.tolist()
+        return (
+            [ent.entity for ent in markup],
+            [ent.start_offset for ent in markup],
+            [ent.end_offset for ent in markup]
+        )
+
+    @staticmethod
+    def _build_index(labels: List[str], starts: List[int], ends: List[int]) -> Dict[str, Tuple[List[int], List[int]]]:
+        """Для каждой метки: начала предсказаний по возрастанию и их индексы"""
+        by_label: Dict[str, List[Tuple[int, int]]] = {}
+        for i, (label, start) in enumerate(zip(labels, starts)):
+            by_label.setdefault(label, []).append((start, i))
+
+        index = {}
+        for label, items in by_label.items():
+            items.sort()
+            index[label] = ([start for start, _ in items], [i for _, i in items])
+        return index
+
+    def _start_window(self, start: int, end: int) -> Tuple[int, int]:
+        """Диапазон начал предсказаний, среди которых может быть пара для gold-сущности"""
+        if self.match_mode == "exact":
+            return start, start
+        if self.match_mode == "overlap":
+            # Предсказание, начавшееся раньше gold, дает объединение не меньше
+            # end - pred_start при пересечении не больше длины gold, поэтому
+            # IoU >= t требует pred_start >= end - (end - start) / t
+            return end - math.ceil((end - start) / self.iou_threshold), max(end - 1, start)
+        return start - self.tolerance, start + self.tolerance
+
+    def _match_indices(
+        self,
+        gold: Tuple[List[str], List[int], List[int]],
+        pred: Tuple[List[str], List[int], List[int]],
+        index: Optional[Dict[str, Tuple[List[int], List[int]]]] = None
+    ) -> List[Optional[int]]:
+        """
+        Жадное сопоставление: каждой gold-сущности по порядку достается первое
+        по индексу свободное подходящее предсказание. Кандидаты ищутся бинарным
+        поиском в окне по началу сущности среди предсказаний той же метки.
+        Возвращает индекс предсказания (или None) для каждой gold-сущности.
+        index - готовый _build_index(*pred), если он переиспользуется.
+        """
+        pred_labels, pred_starts, pred_ends = pred
+        if index is None:
+            index = self._build_index(pred_labels, pred_starts, pred_ends)
+        matched_pred_indices: Set[int] = set()
+        matches: List[Optional[int]] = []
 
+        for label, gold_start, gold_end in zip(*gold):
+            matched_index = None
+            if label in index:
+                starts, indices = index[label]
+                lo, hi = self._start_window(gold_start, gold_end)
+                for k in range(bisect_left(starts, lo), bisect_right(starts, hi)):
+                    i = indices[k]
+                    if (
+                        (matched_index is None or i < matched_index)
+                        and i not in matched_pred_indices
+                        and self._compare_spans(gold_start, gold_end, pred_starts[i], pred_ends[i])
+                    ):
+                        matched_index = i
             if matched_index is not None:
                 matched_pred_indices.add(matched_index)
+            matches.append(matched_index)
+        return matches
+
+    def _match_entities(self, gold_entities: List[Entity], pred_entities: List[Entity]) -> List[Tuple[Optional[Entity], Optional[Entity]]]:
+        matches = self._match_indices(self._markup_columns(gold_entities), self._markup_columns(pred_entities))
+        all_pairs = []
+        for gold, matched_index in zip(gold_entities, matches):
+            if matched_index is not None:
                 all_pairs.append((gold, pred_entities[matched_index]))
             else:
                 all_pairs.append((gold, None))  # Ложноотрицательный результат
 
+        matched_pred_indices = set(matches)
         for i, pred in enumerate(pred_entities):
             if i not in matched_pred_indices:
                 all_pairs.append((None, pred))  # Ложноположительный результат
 
         return all_pairs
 
-    def _calculate_binary_labels(self, entity_pairs: List[Tuple[Optional[Entity], Optional[Entity]]]) -> Tuple[List[int], List[int], Dict[str, Dict[str, List[int]]]]:
-        y_true = []
-        y_pred = []
-        label_map = defaultdict(lambda: {"y_true": [], "y_pred": []})
+    @staticmethod
+    def _counts_from_matches(
+        gold_labels: List[str],
+        pred_labels: List[str],
+        matches: List[Optional[int]]
+    ) -> Dict[str, List[int]]:
+        counts: Dict[str, List[int]] = {}
+        for label, matched_index in zip(gold_labels, matches):
+            counts.setdefault(label, [0, 0, 0])[0 if matched_index is not None else 2] += 1
+        matched_pred_indices = set(matches)
+        for i, label in enumerate(pred_labels):
+            if i not in matched_pred_indices:
+                counts.setdefault(label, [0, 0, 0])[1] += 1
+        return counts
 
-        for gold, pred in entity_pairs:
-            y_true_val = 1 if gold is not None else 0
-            y_pred_val = 1 if pred is not None else 0
+    def count_document(self, doc: Document) -> Dict[str, List[int]]:
+        """Счетчики [TP, FP, FN] по меткам документа"""
+        gold = self._markup_columns(doc.gold_markup)
+        pred = self._markup_columns(doc.pred_markup)
+        return self._counts_from_matches(gold[0], pred[0], self._match_indices(gold, pred))
 
-            y_true.append(y_true_val)
-            y_pred.append(y_pred_val)
+    @staticmethod
+    def _metric_arrays(counts: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Метрики по массиву счетчиков формы (..., 3) с последней осью [TP, FP, FN].
+        Та же семантика, что у precision_recall_fscore_support(average='binary',
+        zero_division=0), а для пустого набора сущностей - 1, 1, 1.
+        """
+        tp, fp, fn = (counts[..., i].astype(np.float64) for i in range(3))
+        support = counts.sum(axis=-1)
+        empty = support == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            f1 = np.where(tp > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+        return {
+            "precision": np.where(empty, 1.0, precision),
+            "recall": np.where(empty, 1.0, recall),
+            "f1": np.where(empty, 1.0, f1),
+            "support": support
+        }
 
-            label = None
-            if gold is not None:
-                label = gold.entity
-            elif pred is not None:
-                label = pred.entity
-            if label:
-                label_map[label]["y_true"].append(y_true_val)
-                label_map[label]["y_pred"].append(y_pred_val)
+    @staticmethod
+    def _count_records(counts: np.ndarray) -> List[Dict[str, int]]:
+        return [{"tp": tp, "fp": fp, "fn": fn} for tp, fp, fn in counts.tolist()]
 
-        return y_true, y_pred, label_map
+    @staticmethod
+    def _metric_records(metrics: Dict[str, np.ndarray], index=slice(None)) -> List[Dict[str, float]]:
+        """Словари метрик для выбранных элементов (по умолчанию - всех, по первой оси)"""
+        return [
+            {"precision": p, "recall": r, "f1": f, "support": s}
+            for p, r, f, s in zip(
+                metrics["precision"][index].tolist(),
+                metrics["recall"][index].tolist(),
+                metrics["f1"][index].tolist(),
+                metrics["support"][index].tolist()
+            )
+        ]
 
-    def _calculate_metrics(self, y_true: List[int], y_pred: List[int]) -> Dict[str, float]:
-        precision, recall, f1, _ = precision_recall_fscore_support(
-            y_true, y_pred, average='binary', zero_division=0
-        )
-        if len(y_true) == len(y_pred) == 0:
-            precision, recall, f1 = 1, 1, 1
-        return {
-            "precision": precision,
-            "recall": recall,
-            "f1": f1,
-            "support": len(y_true)
-        }
+    @staticmethod
+    def _count_array(document_counts: List[Dict[str, List[int]]]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Переводит счетчики документов в массив формы (документы, метки, 3).
+        Метки упорядочены по первому появлению; также возвращаются координаты
+        (документ, метка) заполненных ячеек в исходном порядке.
+        """
+        label_ids: Dict[str, int] = {}
+        doc_rows, label_cols, values = [], [], []
+        for row, counts in enumerate(document_counts):
+            for label, label_counts in counts.items():
+                doc_rows.append(row)
+                label_cols.append(label_ids.setdefault(label, len(label_ids)))
+                values.append(label_counts)
 
-    def _calculate_label_metrics(self, label_map: Dict[str, Dict[str, List[int]]]) -> Dict[str, Dict[str, float]]:
-        label_metrics = {}
-        for label, data in label_map.items():
-            label_metrics[label] = self._calculate_metrics(data["y_true"], data["y_pred"])
+        array = np.zeros((len(document_counts), len(label_ids), 3), dtype=np.int64)
+        doc_rows, label_cols = np.array(doc_rows, dtype=np.intp), np.array(label_cols, dtype=np.intp)
+        if values:
+            array[doc_rows, label_cols] = values
+        return list(label_ids), array, doc_rows, label_cols
 
-        return label_metrics
+    def evaluate_counts(
+        self,
+        document_ids: List[str],
+        document_counts: List[Dict[str, List[int]]],
+        sink: Optional[ResultSink] = None,
+        model_name: str = "Model"
+    ) -> Dict[str, any]:
+        """
+        Агрегация метрик по счетчикам документов ({метка: [TP, FP, FN]}):
+        микро-, макро- и пометочные метрики получаются сверткой массива счетчиков.
+        """
+        labels, counts, doc_rows, label_cols = self._count_array(document_counts)
+        doc_totals = counts.sum(axis=1)
+        doc_metric_arrays = self._metric_arrays(doc_totals)
+        cell_records = iter(self._metric_records(self._metric_arrays(counts), (doc_rows, label_cols)))
 
-    def evaluate(self, docs: List[Document]) -> Dict[str, any]:
         doc_metrics = []
-        global_y_true = []
-        global_y_pred = []
-        global_label_map = defaultdict(lambda: {"y_true": [], "y_pred": []})
+        for doc_id, record, count_record, doc_counts in zip(
+            document_ids, self._metric_records(doc_metric_arrays),
+            self._count_records(doc_totals), document_counts
+        ):
+            doc_metrics.append({
+                "document_id": doc_id,
+                **record,
+                **count_record,
+                "label_metrics": {label: next(cell_records) for label in doc_counts}
+            })
+            if sink:
+                sink.write_document_metrics(model_name, doc_metrics[-1])
+
+        micro_avg = self._metric_records(self._metric_arrays(doc_totals.sum(axis=0, keepdims=True)))[0]
+        results = {
+            "documents": doc_metrics,
+            "micro_avg": micro_avg,
+            "macro_avg": {
+                "precision": np.mean(doc_metric_arrays["precision"]),
+                "recall": np.mean(doc_metric_arrays["recall"]),
+                "f1": np.mean(doc_metric_arrays["f1"])
+            },
+            "label_metrics": dict(zip(labels, self._metric_records(self._metric_arrays(counts.sum(axis=0)))))
+        }
+        if sink:
+            sink.write_summary(model_name, results)
+            sink.flush()
+        return results
+
+    def evaluate(
+        self,
+        docs: List[Document],
+        sink: Optional[ResultSink] = None,
+        model_name: str = "Model"
+    ) -> Dict[str, any]:
+        return self.evaluate_counts(
+            [doc.name for doc in docs],
+            [self.count_document(doc) for doc in docs],
+            sink=sink,
+            model_name=model_name
+        )
+
+    def sweep(
+        self,
+        docs: List[Document],
+        tolerances: Optional[List[int]] = None,
+        label_mappings: Optional[Dict[str, Optional[Dict[str, str]]]] = None,
+        default_label: str = "MISC"
+    ) -> Dict[Tuple[str, int], Dict[str, any]]:
+        """
+        Метрики для всех сочетаний tolerance и маппинга gold-меток за один проход
+        по документам, с тем же сопоставлением, что у evaluate (match_mode
+        валидатора). Маппинг применяется к меткам gold-разметки так же, как
+        LabelStandardizer.map_dataset_label: неизвестные метки становятся
+        default_label, None - метки без изменений. Индекс предсказаний строится
+        один раз на документ; tolerance влияет только на режим "start", в
+        остальных режимах счетчики считаются один раз на маппинг.
+        Возвращает {(имя маппинга, tolerance): результат evaluate без sink}.
+        """
+        # Повторы дали бы одну конфигурацию дважды и сдвинули счетчики документов
+        tolerances = list(dict.fromkeys(
+            int(tol) for tol in (tolerances if tolerances is not None else [self.tolerance])
+        ))
+        label_mappings = dict(label_mappings or {"identity": None})
+        if self.match_mode == "start":
+            validators = {
+                tol: NERValidator(tol, self.match_mode, self.iou_threshold) for tol in tolerances
+            }
+        else:
+            validators = {tol: self for tol in tolerances}
+        configs = [(name, tol) for name in label_mappings for tol in tolerances]
+        document_counts: Dict[Tuple[str, int], List[Dict[str, List[int]]]] = {config: [] for config in configs}
 
         for doc in docs:
-            entity_pairs = self._match_entities(doc.gold_markup, doc.pred_markup)
+            gold_columns = self._markup_columns(doc.gold_markup)
+            pred = self._markup_columns(doc.pred_markup)
+            index = self._build_index(*pred)
 
-            y_true_doc, y_pred_doc, doc_label_map = self._calculate_binary_labels(entity_pairs)
+            for name, mapping in label_mappings.items():
+                gold_labels = [
+                    label if mapping is None else mapping.get(label, default_label)
+                    for label in gold_columns[0]
+                ]
+                gold = (gold_labels, gold_columns[1], gold_columns[2])
+                computed: Dict[int, Dict[str, List[int]]] = {}
+                for tol in tolerances:
+                    validator = validators[tol]
+                    if id(validator) not in computed:
+                        computed[id(validator)] = self._counts_from_matches(
+                            gold_labels, pred[0], validator._match_indices(gold, pred, index)
+                        )
+                    document_counts[(name, tol)].append(computed[id(validator)])
 
-            global_y_true.extend(y_true_doc)
-            global_y_pred.extend(y_pred_doc)
+        names = [doc.name for doc in docs]
+        return {config: self.evaluate_counts(names, document_counts[config]) for config in configs}
 
-            for label, data in doc_label_map.items():
-                global_label_map[label]["y_true"].extend(data["y_true"])
-                global_label_map[label]["y_pred"].extend(data["y_pred"])
+    @staticmethod
+    def _document_count_array(results: Dict[str, any]) -> np.ndarray:
+        documents = results.get("documents") or []
+        if not documents or any(doc.get("tp") is None for doc in documents):
+            raise ValueError("В результатах нет счетчиков TP/FP/FN документов")
+        return np.array([[doc["tp"], doc["fp"], doc["fn"]] for doc in documents], dtype=np.int64)
 
-            doc_metrics_dict = self._calculate_metrics(y_true_doc, y_pred_doc)
+    @classmethod
+    def _bootstrap_metrics(
+        cls,
+        counts: List[np.ndarray],
+        n_resamples: int,
+        seed: Optional[int]
+    ) -> List[Dict[str, np.ndarray]]:
+        """
+        Бутстрэп по документам: каждая выборка задается вектором кратностей
+        документов (сколько раз документ попал в выборку), и микро-счетчики получаются умножением
+        весов на массив счетчиков. Для нескольких моделей на одних документах
+        используются одни и те же веса (парный бутстрэп).
+        Возвращает для каждой модели массивы метрик формы (n_resamples,).
+        """
+        n_docs = len(counts[0])
+        rng = np.random.default_rng(seed)
+        doc_metrics = [cls._metric_arrays(model_counts) for model_counts in counts]
+        samples = [{f"{avg}_{name}": [] for avg in ("micro", "macro") for name in ("precision", "recall", "f1")} for _ in counts]
 
-            doc_label_metrics = self._calculate_label_metrics(doc_label_map)
+        # Ограничиваем матрицу весов примерно 4 млн элементов
+        block = max(1, min(n_resamples, 4_000_000 // n_docs))
+        for start in range(0, n_resamples, block):
+            size = min(block, n_resamples - start)
+            picks = rng.integers(0, n_docs, size=(size, n_docs))
+            picks += np.arange(size)[:, None] * n_docs
+            weights = np.bincount(picks.ravel(), minlength=size * n_docs).reshape(size, n_docs)
+            for model_counts, model_doc_metrics, model_samples in zip(counts, doc_metrics, samples):
+                micro = cls._metric_arrays(weights @ model_counts)
+                for name in ("precision", "recall", "f1"):
+                    model_samples[f"micro_{name}"].append(micro[name])
+                    model_samples[f"macro_{name}"].append(weights @ model_doc_metrics[name] / n_docs)
+        return [{key: np.concatenate(values) for key, values in model_samples.items()} for model_samples in samples]
 
-            doc_metrics.append({
-                "document_id": doc.name,
-                **doc_metrics_dict,
-                "label_metrics": doc_label_metrics
-            })
+    @staticmethod
+    def _split_metric_key(key: str) -> Tuple[str, str]:
+        avg, name = key.split("_", 1)
+        return f"{avg}_avg", name
 
-        micro_avg = self._calculate_metrics(global_y_true, global_y_pred)
-        macro_avg = {
-            "precision": np.mean([m["precision"] for m in doc_metrics]),
-            "recall": np.mean([m["recall"] for m in doc_metrics]),
-            "f1": np.mean([m["f1"] for m in doc_metrics])
-        }
+    @classmethod
+    def confidence_intervals(
+        cls,
+        results: Dict[str, any],
+        n_resamples: int = 1000,
+        confidence: float = 0.95,
+        seed: Optional[int] = None
+    ) -> Dict[str, Dict[str, Tuple[float, float]]]:
+        """
+        Процентильные бутстрэп-интервалы микро- и макро-метрик по результату
+        evaluate: {"micro_avg": {"f1": (low, high), ...}, "macro_avg": {...}}.
+        """
+        samples = cls._bootstrap_metrics([cls._document_count_array(results)], n_resamples, seed)[0]
+        alpha = (1 - confidence) / 2
+        intervals: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        for key, values in samples.items():
+            avg, name = cls._split_metric_key(key)
+            low, high = np.quantile(values, [alpha, 1 - alpha])
+            intervals.setdefault(avg, {})[name] = (float(low), float(high))
+        return intervals
+
+    @classmethod
+    def paired_test(
+        cls,
+        results_a: Dict[str, any],
+        results_b: Dict[str, any],
+        n_resamples: int = 1000,
+        confidence: float = 0.95,
+        seed: Optional[int] = None
+    ) -> Dict[str, Dict[str, Dict[str, any]]]:
+        """
+        Парный бутстрэп-тест разницы метрик (A - B) на общих документах.
+        Для каждой метрики: разница, доверительный интервал разницы и
+        двусторонний p-value для гипотезы об отсутствии разницы.
+        """
+        docs_b = {doc["document_id"]: i for i, doc in enumerate(results_b.get("documents") or [])}
+        common = [
+            (i, docs_b[doc["document_id"]])
+            for i, doc in enumerate(results_a.get("documents") or [])
+            if doc["document_id"] in docs_b
+        ]
+        if not common:
+            raise ValueError("У моделей нет общих документов")
+        index_a, index_b = (np.array(index) for index in zip(*common))
+        counts_a = cls._document_count_array(results_a)[index_a]
+        counts_b = cls._document_count_array(results_b)[index_b]
+
+        observed = [cls._observed_metrics(counts) for counts in (counts_a, counts_b)]
+        samples_a, samples_b = cls._bootstrap_metrics([counts_a, counts_b], n_resamples, seed)
+        alpha = (1 - confidence) / 2
+
+        report: Dict[str, Dict[str, Dict[str, any]]] = {}
+        for key in samples_a:
+            avg, name = cls._split_metric_key(key)
+            difference = observed[0][key] - observed[1][key]
+            deltas = samples_a[key] - samples_b[key]
+            low, high = np.quantile(deltas, [alpha, 1 - alpha])
+            # Распределение разницы, сдвинутое к нулевой гипотезе
+            extreme = np.count_nonzero(np.abs(deltas - difference) >= abs(difference))
+            report.setdefault(avg, {})[name] = {
+                "difference": float(difference),
+                "interval": (float(low), float(high)),
+                "p_value": float((extreme + 1) / (len(deltas) + 1))
+            }
+        return report
+
+    @classmethod
+    def _observed_metrics(cls, counts: np.ndarray) -> Dict[str, float]:
+        micro = cls._metric_arrays(counts.sum(axis=0))
+        macro = cls._metric_arrays(counts)
+        observed = {}
+        for name in ("precision", "recall", "f1"):
+            observed[f"micro_{name}"] = float(micro[name])
+            observed[f"macro_{name}"] = float(np.mean(macro[name]))
+        return observed
 
-        label_metrics = self._calculate_label_metrics(global_label_map)
-        return {
-            "documents": doc_metrics,
-            "micro_avg": micro_avg,
-            "macro_avg": macro_avg,
-            "label_metrics": label_metrics
-        }
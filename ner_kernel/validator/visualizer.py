@@ -4,6 +4,9 @@ import numpy as np
 import seaborn as sns
 from typing import Dict, List, Optional, Union, Tuple
 
+from .results import load_results
+from .validator import NERValidator
+
 
 class NERVisualizer:
 
@@ -12,6 +15,16 @@ class NERVisualizer:
         self.style = style
         sns.set_style(style)
 
+    @staticmethod
+    def load_results(path: str,
+                     models: Optional[List[str]] = None,
+                     include_docs: bool = True) -> Dict[str, Dict]:
+        """
+        Загрузка results_dict из JSONL/Parquet, записанного ResultSink,
+        только для нужных моделей и без лишних колонок документов.
+        """
+        return load_results(path, models=models, include_documents=include_docs)
+
     def _prepare_metrics_dataframe(self,
                                    results: Dict[str, Dict],
                                    model_name: str = "Model") -> pd.DataFrame:
@@ -61,7 +74,16 @@ class NERVisualizer:
                               results_dict: Dict[str, Dict],
                               metric: str = 'F1',
                               figsize: Optional[Tuple[int, int]] = None,
-                              title: str = "Сравнение NER моделей") -> plt.Figure:
+                              title: str = "Сравнение NER моделей",
+                              n_resamples: int = 1000,
+                              confidence: float = 0.95,
+                              baseline: Optional[str] = None,
+                              seed: Optional[int] = 0) -> plt.Figure:
+        """
+        При наличии счетчиков TP/FP/FN документов столбцы дополняются
+        бутстрэп-интервалами (n_resamples=0 - без интервалов), а при заданном
+        baseline над моделями подписывается p-value парного теста с ней.
+        """
         df = self._prepare_multi_model_dataframe(results_dict)
 
         avg_df = df[df['Metric Type'].isin(['Micro Average', 'Macro Average'])]
@@ -83,8 +105,27 @@ class NERVisualizer:
                         if not avg_df[(avg_df['Model'] == model) & macro_mask].empty else 0
                         for model in models]
 
-        ax.bar(index - bar_width/2, micro_values, bar_width, label=f'Micro {metric}')
-        ax.bar(index + bar_width/2, macro_values, bar_width, label=f'Macro {metric}')
+        intervals = self._bootstrap_intervals(results_dict, models, n_resamples, confidence, seed)
+        micro_err = self._error_bars(intervals, models, 'micro_avg', metric, micro_values)
+        macro_err = self._error_bars(intervals, models, 'macro_avg', metric, macro_values)
+
+        ax.bar(index - bar_width/2, micro_values, bar_width, yerr=micro_err, capsize=4,
+               label=f'Micro {metric}')
+        ax.bar(index + bar_width/2, macro_values, bar_width, yerr=macro_err, capsize=4,
+               label=f'Macro {metric}')
+
+        if baseline in results_dict and n_resamples:
+            for i, model in enumerate(models):
+                if model == baseline:
+                    continue
+                try:
+                    test = NERValidator.paired_test(results_dict[model], results_dict[baseline],
+                                                    n_resamples=n_resamples, seed=seed)
+                except ValueError:
+                    continue
+                p_value = test['micro_avg'][metric.lower()]['p_value']
+                ax.text(i, max(micro_values[i], macro_values[i]) + 0.05,
+                        f'p={p_value:.3f} vs {baseline}', ha='center', fontsize=9)
 
         ax.set_xlabel('Модели')
         ax.set_ylabel(metric)
@@ -96,6 +137,40 @@ class NERVisualizer:
         plt.tight_layout()
         return fig
 
+    @staticmethod
+    def _bootstrap_intervals(results_dict: Dict[str, Dict],
+                             models: List[str],
+                             n_resamples: int,
+                             confidence: float,
+                             seed: Optional[int]) -> Dict[str, Dict]:
+        intervals = {}
+        if not n_resamples:
+            return intervals
+        for model in models:
+            try:
+                intervals[model] = NERValidator.confidence_intervals(
+                    results_dict[model], n_resamples=n_resamples, confidence=confidence, seed=seed
+                )
+            except ValueError:
+                # Результаты без счетчиков документов (например, старый stat2.json)
+                continue
+        return intervals
+
+    @staticmethod
+    def _error_bars(intervals: Dict[str, Dict],
+                    models: List[str],
+                    average: str,
+                    metric: str,
+                    values: List[float]) -> Optional[np.ndarray]:
+        if not intervals:
+            return None
+        errors = np.zeros((2, len(models)))
+        for i, (model, value) in enumerate(zip(models, values)):
+            if model in intervals:
+                low, high = intervals[model][average][metric.lower()]
+                errors[:, i] = (max(value - low, 0), max(high - value, 0))
+        return errors
+
     def plot_label_performance(self,
                                results: Dict,
                                model_name: str = "Model",
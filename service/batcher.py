@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from .workers import QueueFullError
+
+BatchRunner = Callable[[List[Any]], Awaitable[List[Any]]]
+
+
+class MicroBatcher:
+    """
+    Объединяет одновременные запросы к одной модели в пакет. Пакет по ключу
+    отправляется, когда набралось max_batch_size элементов или с момента
+    первого элемента прошло max_wait_ms; результаты раздаются ожидающим.
+    Число принятых, но еще не обработанных запросов ограничено max_queue для
+    каждой группы ключей queue_key(key); при переполнении - QueueFullError.
+    """
+
+    def __init__(
+        self,
+        max_wait_ms: float = 10,
+        max_batch_size: int = 16,
+        max_queue: Optional[int] = None,
+        queue_key: Optional[Callable[[Hashable], Hashable]] = None
+    ):
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue = max_queue
+        self.queue_key = queue_key or (lambda key: key)
+        self._queued: Dict[Hashable, int] = {}
+        self._batches: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, item: Any, runner: BatchRunner) -> Any:
+        group = self.queue_key(key)
+        queued = self._queued.get(group, 0)
+        if self.max_queue is not None and queued >= self.max_queue:
+            raise QueueFullError(f"Очередь {group} переполнена ({self.max_queue})")
+        self._queued[group] = queued + 1
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._batches.setdefault(key, [])
+        batch.append((item, future))
+
+        if len(batch) >= self.max_batch_size:
+            self._flush(key, runner)
+        elif len(batch) == 1:
+            self._timers[key] = loop.call_later(self.max_wait, self._flush, key, runner)
+        return await future
+
+    def _flush(self, key: Hashable, runner: BatchRunner):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._batches.pop(key, None)
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._run(self.queue_key(key), batch, runner))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: Hashable, batch: List[Tuple[Any, asyncio.Future]], runner: BatchRunner):
+        # Запросы отменившихся клиентов все равно обрабатываются в пакете,
+        # поэтому из очереди они уходят только после выполнения пакета
+        try:
+            results = await runner([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._queued[group] -= len(batch)
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
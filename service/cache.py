@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+class PredictionCache:
+    """
+    Кэш предсказаний по хэшу текста, фреймворку и модели. Первый уровень -
+    LRU в памяти с TTL, второй (если задан db_path) - SQLite на диске,
+    который переживает перезапуск сервиса. Чтение с диска идет в пуле потоков,
+    запись - в отдельном потоке пакетами до write_batch_size записей на commit,
+    так что event loop не ждет SQLite.
+    """
+
+    def __init__(
+        self,
+        max_items: int = 10000,
+        ttl_seconds: float = 3600,
+        db_path: Optional[str] = None,
+        write_batch_size: int = 256
+    ):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.write_batch_size = write_batch_size
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._writes: "queue.Queue[Optional[Tuple[str, float, List[dict]]]]" = queue.Queue()
+        self._writer = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions "
+                "(key TEXT PRIMARY KEY, created REAL NOT NULL, entities TEXT NOT NULL)"
+            )
+            self._db.commit()
+            self._writer = threading.Thread(target=self._write_loop, name="prediction-cache-writer", daemon=True)
+            self._writer.start()
+
+    @staticmethod
+    def make_key(text: str, framework: str, model_name: str, variant: str = "") -> str:
+        """variant - настройки исполнителя модели (backend и т.п.), влияющие на результат"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{framework}:{model_name}:{variant}:{digest}"
+
+    async def get(self, key: str) -> Optional[List[dict]]:
+        now = time.time()
+        item = self._items.get(key)
+        if item is not None:
+            created, entities = item
+            if now - created <= self.ttl_seconds:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return entities
+            del self._items[key]
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._read, key)
+            if row is not None and now - row[0] <= self.ttl_seconds:
+                entities = json.loads(row[1])
+                self._remember(key, row[0], entities)
+                self.disk_hits += 1
+                return entities
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, entities: List[dict]):
+        created = time.time()
+        self._remember(key, created, entities)
+        if self._writer is not None:
+            self._writes.put((key, created, entities))
+
+    def _read(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT created, entities FROM predictions WHERE key = ?", (key,)
+            ).fetchone()
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [self._writes.get()]
+            while len(batch) < self.write_batch_size:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            if not batch:
+                continue
+            rows = [
+                (key, created, json.dumps(entities, ensure_ascii=False))
+                for key, created, entities in batch
+            ]
+            with self._db_lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO predictions (key, created, entities) VALUES (?, ?, ?)", rows
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, created: float, entities: List[dict]):
+        self._items[key] = (created, entities)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        requests = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / requests if requests else 0.0,
+            "size": len(self._items),
+            "max_items": self.max_items,
+        }
+
+    def close(self):
+        if self._writer is not None:
+            # Оставшиеся записи сохраняются до закрытия базы
+            self._writes.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._db is not None:
+            self._db.close()
@@ -0,0 +1,60 @@
+import os
+from typing import List, Tuple
+
+from ner_kernel.logger import logger
+
+# Число потоков инференса на один фреймворк
+WORKERS_PER_FRAMEWORK = int(os.getenv("NER_WORKERS_PER_FRAMEWORK", "1"))
+# Максимум запросов, ожидающих инференса одного фреймворка; сверх него - 429
+MAX_QUEUE_SIZE = int(os.getenv("NER_MAX_QUEUE_SIZE", "64"))
+
+# Реестр моделей: бюджет памяти (оценка по приросту RSS при загрузке) и
+# предельное число одновременно загруженных моделей
+MODEL_MEMORY_MB = float(os.getenv("NER_MODEL_MEMORY_MB", "4096"))
+MAX_LOADED_MODELS = int(os.getenv("NER_MAX_LOADED_MODELS", "6"))
+
+
+def parse_warmup_models(value: str) -> List[Tuple[str, str]]:
+    """Записи "фреймворк:модель" через запятую; некорректные пропускаются с предупреждением"""
+    models = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        framework, _, model_name = item.partition(":")
+        if not framework.strip() or not model_name.strip():
+            logger.warning(f"NER_WARMUP_MODELS: пропущена запись '{item}', ожидается формат фреймворк:модель")
+            continue
+        models.append((framework.strip(), model_name.strip()))
+    return models
+
+
+# Модели, загружаемые при старте, в формате "spacy:ru_core_news_sm,hf:dslim/bert-base-NER".
+# Остальные модели загружаются при первом запросе.
+WARMUP_MODELS = parse_warmup_models(os.getenv("NER_WARMUP_MODELS", ""))
+
+# Исполнитель моделей Hugging Face: torch, onnx или quantized (ONNX + int8,
+# требует optimum[onnxruntime]) и каталог кэша экспортированных моделей
+HF_BACKEND = os.getenv("NER_HF_BACKEND", "torch")
+HF_ONNX_CACHE_DIR = os.getenv("NER_HF_ONNX_CACHE_DIR") or None
+
+# Микробатчинг /predict: сколько ждать попутные запросы и предельный размер пакета.
+# Большее ожидание повышает пропускную способность ценой задержки p50.
+BATCH_MAX_WAIT_MS = float(os.getenv("NER_BATCH_MAX_WAIT_MS", "10"))
+BATCH_MAX_SIZE = int(os.getenv("NER_BATCH_MAX_SIZE", "16"))
+
+# Кэш предсказаний: размер LRU в памяти, время жизни записи и файл SQLite
+# для дискового уровня (пустое значение - без диска)
+CACHE_MAX_ITEMS = int(os.getenv("NER_CACHE_MAX_ITEMS", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("NER_CACHE_TTL_SECONDS", "3600"))
+CACHE_DB_PATH = os.getenv("NER_CACHE_DB_PATH") or None
+
+# Пул соединений для загрузки страниц по ссылке
+HTTP_TIMEOUT = float(os.getenv("NER_HTTP_TIMEOUT", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("NER_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("NER_HTTP_MAX_KEEPALIVE", "20"))
+# Предельный размер страницы, число страниц в кэше ETag/Last-Modified и парсер HTML
+# (auto, selectolax, lxml или html.parser)
+FETCH_MAX_BYTES = int(os.getenv("NER_FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+FETCH_CACHE_SIZE = int(os.getenv("NER_FETCH_CACHE_SIZE", "256"))
+HTML_PARSER = os.getenv("NER_HTML_PARSER", "auto")
@@ -0,0 +1,163 @@
+import asyncio
+import codecs
+import re
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional
+
+import httpx
+
+
+# <meta charset="..."> или <meta http-equiv="Content-Type" content="...; charset=...">
+# и XML-объявление encoding="..." в начале документа
+META_CHARSET_REGEX = re.compile(
+    rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)|<\?xml[^>]+encoding\s*=\s*["']([A-Za-z0-9._:-]+)""",
+    re.IGNORECASE
+)
+META_SNIFF_BYTES = 4096
+
+
+class PageFetchError(Exception):
+    pass
+
+
+class CachedPage(NamedTuple):
+    etag: Optional[str]
+    last_modified: Optional[str]
+    text: str
+
+
+def detect_encoding(body: bytes, header_encoding: Optional[str] = None) -> str:
+    """
+    Кодировка страницы: charset из Content-Type, затем <meta charset> (или
+    XML-объявление) в начале документа, иначе UTF-8. Неизвестные кодеку
+    имена пропускаются.
+    """
+    candidates = [header_encoding]
+    match = META_CHARSET_REGEX.search(body[:META_SNIFF_BYTES])
+    if match:
+        candidates.append((match.group(1) or match.group(2)).decode("ascii"))
+    for encoding in candidates:
+        if not encoding:
+            continue
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            continue
+    return "utf-8"
+
+
+def _extract_with_selectolax(html: str) -> str:
+    from selectolax.parser import HTMLParser
+
+    tree = HTMLParser(html)
+    return " ".join(node.text(separator=" ") for node in tree.css("p")).strip()
+
+
+def _extract_with_lxml(html: str) -> str:
+    import lxml.etree
+    import lxml.html
+
+    # На пустой документ lxml отвечает ParserError, остальные парсеры - пустым текстом
+    if not html.strip():
+        return ""
+    try:
+        try:
+            root = lxml.html.document_fromstring(html)
+        except ValueError:
+            # lxml не принимает str с XML-объявлением кодировки
+            root = lxml.html.document_fromstring(html.encode("utf-8"))
+    except lxml.etree.ParserError:
+        return ""
+    return " ".join(" ".join(p.itertext()) for p in root.iter("p")).strip()
+
+
+def _extract_with_bs4(html: str) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.find_all("p")
+    return " ".join(p.get_text(separator=" ") for p in paragraphs).strip()
+
+
+HTML_EXTRACTORS: Dict[str, Callable[[str], str]] = {
+    "selectolax": _extract_with_selectolax,
+    "lxml": _extract_with_lxml,
+    "html.parser": _extract_with_bs4,
+}
+
+
+def get_extractor(parser: str = "auto") -> Callable[[str], str]:
+    """Извлечение текста абзацев <p>; auto - самый быстрый из установленных парсеров"""
+    if parser != "auto":
+        return HTML_EXTRACTORS[parser]
+    for module, name in (("selectolax", "selectolax"), ("lxml", "lxml")):
+        try:
+            __import__(module)
+            return HTML_EXTRACTORS[name]
+        except ImportError:
+            continue
+    return HTML_EXTRACTORS["html.parser"]
+
+
+class PageFetcher:
+    """
+    Загрузка страниц по ссылке через общий пул соединений с ограничением размера.
+    Извлеченный текст кэшируется вместе с ETag/Last-Modified: повторный запрос
+    той же ссылки становится условным, и при ответе 304 страница не разбирается заново.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        max_bytes: int = 5 * 1024 * 1024,
+        cache_size: int = 256,
+        parser: str = "auto"
+    ):
+        self.client = client
+        self.max_bytes = max_bytes
+        self.cache_size = cache_size
+        self.extract = get_extractor(parser)
+        self._pages: "OrderedDict[str, CachedPage]" = OrderedDict()
+
+    async def fetch_text(self, url: str) -> str:
+        cached = self._pages.get(url)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and cached is not None:
+                    self._pages.move_to_end(url)
+                    return cached.text
+                response.raise_for_status()
+                html = await self._read_body(response)
+        except httpx.HTTPError as e:
+            raise PageFetchError(str(e)) from e
+
+        # Разбор HTML занимает заметное время, поэтому не блокируем event loop
+        text = await asyncio.to_thread(self.extract, html)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._pages[url] = CachedPage(etag, last_modified, text)
+            self._pages.move_to_end(url)
+            while len(self._pages) > self.cache_size:
+                self._pages.popitem(last=False)
+        return text
+
+    async def _read_body(self, response: httpx.Response) -> str:
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise PageFetchError(f"Страница больше {self.max_bytes} байт")
+
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body.extend(chunk)
+            if len(body) > self.max_bytes:
+                raise PageFetchError(f"Страница больше {self.max_bytes} байт")
+        return body.decode(detect_encoding(bytes(body), response.charset_encoding), errors="replace")
@@ -0,0 +1,147 @@
+import asyncio
+import gc
+import importlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import psutil
+
+from ner_kernel import BaseNERModel
+from ner_kernel.logger import logger
+from .startup import StartupReport
+
+ModelKey = Tuple[str, str]
+
+
+class ModelLoadError(Exception):
+    pass
+
+
+class LazyModelFactory:
+    """Обертка фреймворка импортируется только при первой загрузке его модели"""
+
+    # Аргументы, не влияющие на предсказания (не входят в variant)
+    NON_PREDICTIVE_KWARGS = BaseNERModel.NON_PREDICTIVE_KWARGS
+
+    def __init__(self, module: str, class_name: str, report: Optional[StartupReport] = None, **model_kwargs):
+        self.module = module
+        self.class_name = class_name
+        self.report = report
+        # Дополнительные аргументы конструктора модели, например backend для HFNERModel
+        self.model_kwargs = model_kwargs
+        self._model_class = None
+
+    def __call__(self, model_name: str) -> BaseNERModel:
+        if self._model_class is None:
+            if self.report:
+                with self.report.measure_import(self.module):
+                    module = importlib.import_module(self.module)
+            else:
+                module = importlib.import_module(self.module)
+            self._model_class = getattr(module, self.class_name)
+        return self._model_class(model_name, **self.model_kwargs)
+
+    @property
+    def variant(self) -> str:
+        """Настройки модели, от которых зависит результат (например, backend=quantized)"""
+        return ",".join(
+            f"{name}={value}" for name, value in sorted(self.model_kwargs.items())
+            if name not in self.NON_PREDICTIVE_KWARGS
+        )
+
+
+class ModelRegistry:
+    """
+    Загруженные модели по ключу (framework, model_name). Держит несколько моделей
+    одновременно и вытесняет давно не использованные, когда суммарная оценка
+    памяти превышает max_memory_mb или моделей больше max_models.
+    Одновременные запросы одной модели ждут одну и ту же загрузку.
+    """
+
+    def __init__(
+        self,
+        factories: Dict[str, Callable[[str], BaseNERModel]],
+        max_memory_mb: float = 4096,
+        max_models: int = 6,
+        report: Optional[StartupReport] = None
+    ):
+        self.factories = factories
+        self.max_memory_mb = max_memory_mb
+        self.max_models = max_models
+        self.report = report
+        self._models: "OrderedDict[ModelKey, BaseNERModel]" = OrderedDict()
+        self._memory_mb: Dict[ModelKey, float] = {}
+        self._loading: Dict[ModelKey, asyncio.Future] = {}
+        # Загрузки идут по одной, чтобы прирост RSS относился к одной модели
+        self._load_lock = threading.Lock()
+
+    @property
+    def frameworks(self) -> List[str]:
+        return list(self.factories)
+
+    def loaded(self) -> Dict[str, float]:
+        return {f"{framework}:{name}": mb for (framework, name), mb in self._memory_mb.items()}
+
+    async def get(self, framework: str, model_name: str) -> BaseNERModel:
+        key = (framework, model_name)
+        if key in self._models:
+            self._models.move_to_end(key)
+            return self._models[key]
+
+        if key not in self._loading:
+            loop = asyncio.get_running_loop()
+            self._loading[key] = loop.run_in_executor(None, self._load, key)
+        future = self._loading[key]
+        try:
+            model = await asyncio.shield(future)
+        finally:
+            if self._loading.get(key) is future and future.done():
+                del self._loading[key]
+
+        if key not in self._models:
+            self._models[key] = model
+            self._evict(keep=key)
+        return model
+
+    def _load(self, key: ModelKey) -> BaseNERModel:
+        framework, model_name = key
+        with self._load_lock:
+            process = psutil.Process()
+            start_time = time.perf_counter()
+            start_memory = process.memory_info().rss / 1024 / 1024
+            try:
+                model = self.factories[framework](model_name)
+            except Exception as e:
+                raise ModelLoadError(f"Не удалось загрузить модель {model_name}: {str(e)}") from e
+            memory_used = max(process.memory_info().rss / 1024 / 1024 - start_memory, 0.0)
+            load_time = time.perf_counter() - start_time
+
+        self._memory_mb[key] = memory_used
+        if self.report:
+            self.report.record_model(f"{framework}:{model_name}", load_time, memory_used)
+        logger.info(
+            f"Модель {framework}:{model_name} загружена за {load_time:.2f} сек, ~{memory_used:.0f} МБ")
+        return model
+
+    def _evict(self, keep: ModelKey):
+        def over_budget() -> bool:
+            return (
+                sum(self._memory_mb.get(key, 0.0) for key in self._models) > self.max_memory_mb
+                or len(self._models) > self.max_models
+            )
+
+        evicted = False
+        while over_budget() and len(self._models) > 1:
+            key = next(iter(self._models))
+            if key == keep:
+                self._models.move_to_end(key)
+                key = next(iter(self._models))
+            del self._models[key]
+            self._memory_mb.pop(key, None)
+            evicted = True
+            logger.info(f"Модель {key[0]}:{key[1]} выгружена из памяти")
+        if evicted:
+            # Освобождаем веса сразу, а не при следующей сборке мусора
+            gc.collect()
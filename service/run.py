@@ -1,25 +1,106 @@
-import requests
+import functools
 import re
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+
+import httpx
 
 from .classes import NERRequest, NERResponse, EntityResponse
-from ner_kernel import SpacyNERModel, HFNERModel, BaseNERModel, FlairNERModel, Entity
-from bs4 import BeautifulSoup
+from .config import (
+    WORKERS_PER_FRAMEWORK, MAX_QUEUE_SIZE, BATCH_MAX_WAIT_MS, BATCH_MAX_SIZE,
+    MODEL_MEMORY_MB, MAX_LOADED_MODELS, WARMUP_MODELS,
+    CACHE_MAX_ITEMS, CACHE_TTL_SECONDS, CACHE_DB_PATH,
+    HTTP_TIMEOUT, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE,
+    FETCH_MAX_BYTES, FETCH_CACHE_SIZE, HTML_PARSER, HF_BACKEND, HF_ONNX_CACHE_DIR
+)
+from .workers import ModelWorker, QueueFullError
+from .batcher import MicroBatcher
+from .registry import ModelRegistry, ModelLoadError, LazyModelFactory
+from .startup import StartupReport
+from .cache import PredictionCache
+from .fetcher import PageFetcher, PageFetchError
+from ner_kernel import BaseNERModel, Entity, TextChunker
+from ner_kernel.logger import logger
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List
 
+DEFAULT_MODELS = {
+    "spacy": "ru_core_news_sm",
+    "hf": "dslim/bert-base-NER",
+    "flair": "ner-fast"
+}
+
+startup_report = StartupReport()
+
+model_registry = ModelRegistry(
+    factories={
+        "spacy": LazyModelFactory("ner_kernel.models.spacy_model", "SpacyNERModel", startup_report),
+        "hf": LazyModelFactory(
+            "ner_kernel.models.hugging_face_model", "HFNERModel", startup_report,
+            backend=HF_BACKEND, cache_dir=HF_ONNX_CACHE_DIR
+        ),
+        "flair": LazyModelFactory("ner_kernel.models.flair_model", "FlairNERModel", startup_report)
+    },
+    max_memory_mb=MODEL_MEMORY_MB,
+    max_models=MAX_LOADED_MODELS,
+    report=startup_report
+)
+
+model_workers = {
+    framework: ModelWorker(framework, max_workers=WORKERS_PER_FRAMEWORK, max_queue=MAX_QUEUE_SIZE)
+    for framework in model_registry.frameworks
+}
+
+# Ограничение очереди считается в запросах на фреймворк, а не в пакетах воркера
+batcher = MicroBatcher(
+    max_wait_ms=BATCH_MAX_WAIT_MS, max_batch_size=BATCH_MAX_SIZE,
+    max_queue=MAX_QUEUE_SIZE, queue_key=lambda key: key[0]
+)
+
+prediction_cache = PredictionCache(
+    max_items=CACHE_MAX_ITEMS, ttl_seconds=CACHE_TTL_SECONDS, db_path=CACHE_DB_PATH
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http_client = httpx.AsyncClient(
+        timeout=HTTP_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE
+        ),
+        follow_redirects=True
+    )
+    app.state.page_fetcher = PageFetcher(
+        app.state.http_client, max_bytes=FETCH_MAX_BYTES,
+        cache_size=FETCH_CACHE_SIZE, parser=HTML_PARSER
+    )
+    for framework, model_name in WARMUP_MODELS:
+        # Ошибка прогрева не должна останавливать сервис: модель загрузится при первом запросе
+        if framework not in model_registry.frameworks:
+            logger.warning(f"NER_WARMUP_MODELS: неизвестный фреймворк '{framework}' в записи {framework}:{model_name}")
+            continue
+        try:
+            await model_registry.get(framework, model_name)
+        except ModelLoadError as e:
+            logger.warning(f"NER_WARMUP_MODELS: не удалось прогреть {framework}:{model_name}: {str(e)}")
+    startup_report.mark_ready()
+    yield
+    await app.state.http_client.aclose()
+    for worker in model_workers.values():
+        worker.shutdown()
+    prediction_cache.close()
+
+
 app = FastAPI(
     title="NER Service",
     description="Сервис для Named Entity Recognition",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-model_registry = {
-    "spacy": SpacyNERModel(model_name="ru_core_news_sm"),
-    "hf": HFNERModel(model_name="dslim/bert-base-NER"),
-    "flair": FlairNERModel(model_name="ner-fast")
-}
-
 origins = [
     "http://localhost:3000", "http://127.0.0.1:3000",
     "http://localhost:80", "http://127.0.0.1:80",
@@ -45,32 +126,71 @@ def is_url(text: str) -> bool:
     return bool(URL_REGEX.match(text))
 
 
+async def fetch_text(url: str) -> str:
+    try:
+        return await app.state.page_fetcher.fetch_text(url)
+    except PageFetchError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Не удалось загрузить страницу по ссылке: {str(e)}")
+
+
+def run_model(model: BaseNERModel, texts: List[str]) -> List[List[Entity]]:
+    return TextChunker.for_model(model).predict_texts(model, texts)
+
+
+async def predict_batch(framework: str, model_name: str, texts: List[str]) -> List[List[Entity]]:
+    model = await model_registry.get(framework, model_name)
+    return await model_workers[framework].run(run_model, model, texts)
+
+
 @app.post("/predict", response_model=NERResponse)
-def predict_ner(req: NERRequest):
-    if req.framework not in model_registry:
+async def predict_ner(req: NERRequest):
+    if req.framework not in model_registry.frameworks:
         raise HTTPException(status_code=404, detail="Модель не найдена")
 
     if is_url(req.text):
-        try:
-            response = requests.get(req.text)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            raise HTTPException(
-                status_code=400, detail=f"Не удалось загрузить страницу по ссылке: {str(e)}")
-        soup = BeautifulSoup(response.text, "html.parser")
-        paragraphs = soup.find_all("p")
-        extracted_text = " ".join(p.get_text(separator=" ") for p in paragraphs).strip()
+        extracted_text = await fetch_text(req.text)
     else:
         extracted_text = req.text
 
-    model_name: str = req.model_name if req.model_name else model_registry[req.framework].model_name
-    model: BaseNERModel = model_registry[req.framework]
-    model.change_model(model_name)
+    model_name: str = req.model_name if req.model_name else DEFAULT_MODELS[req.framework]
+
+    cache_key = prediction_cache.make_key(
+        extracted_text, req.framework, model_name,
+        getattr(model_registry.factories[req.framework], "variant", "")
+    )
+    cached_entities = await prediction_cache.get(cache_key)
+    if cached_entities is not None:
+        return NERResponse(entities=[EntityResponse(**e) for e in cached_entities])
+
+    try:
+        entities: List[Entity] = await batcher.submit(
+            (req.framework, model_name), extracted_text,
+            functools.partial(predict_batch, req.framework, model_name)
+        )
+    except QueueFullError:
+        raise HTTPException(status_code=429, detail="Сервис перегружен, повторите запрос позже")
+    except ModelLoadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    entity_dicts = [asdict(e) for e in entities]
+    prediction_cache.set(cache_key, entity_dicts)
+    return NERResponse(entities=[EntityResponse(**e) for e in entity_dicts])
+
+
+@app.get("/models")
+def loaded_models():
+    return {"loaded": model_registry.loaded()}
+
+
+@app.get("/cache")
+def cache_stats():
+    return prediction_cache.stats()
 
-    entities: List[Entity] = model.predict_entities(extracted_text)
 
-    response_entities = [EntityResponse(**e.__dict__) for e in entities]
-    return NERResponse(entities=response_entities)
+@app.get("/startup")
+def startup_stats():
+    return startup_report.as_dict()
 
 
 @app.get("/")
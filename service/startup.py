@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import psutil
+
+from ner_kernel.logger import logger
+
+
+class StartupReport:
+    """Время импорта фреймворков и загрузки моделей с момента старта процесса"""
+
+    def __init__(self):
+        self.process_started = psutil.Process().create_time()
+        self.imports: Dict[str, float] = {}
+        self.models: Dict[str, Dict[str, float]] = {}
+        self.ready_seconds: Optional[float] = None
+
+    @contextmanager
+    def measure_import(self, module: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.imports[module] = time.perf_counter() - start
+
+    def record_model(self, name: str, seconds: float, memory_mb: float):
+        self.models[name] = {"seconds": seconds, "memory_mb": memory_mb}
+
+    def mark_ready(self):
+        self.ready_seconds = time.time() - self.process_started
+        lines = [f"Сервис готов через {self.ready_seconds:.2f} сек после старта процесса"]
+        lines += [f"  импорт {name}: {seconds:.2f} сек" for name, seconds in self.imports.items()]
+        lines += [
+            f"  загрузка {name}: {stats['seconds']:.2f} сек, ~{stats['memory_mb']:.0f} МБ"
+            for name, stats in self.models.items()
+        ]
+        logger.info("\n".join(lines))
+
+    def as_dict(self) -> Dict:
+        return {
+            "ready_seconds": self.ready_seconds,
+            "imports": self.imports,
+            "models": self.models,
+        }
@@ -0,0 +1,49 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class ModelWorker:
+    """
+    Ограниченный пул потоков для инференса одного фреймворка. Число ожидающих
+    задач ограничено max_queue: при переполнении сразу выбрасывается
+    QueueFullError, чтобы сервис отвечал 429, а не копил задержку.
+    """
+
+    def __init__(self, name: str, max_workers: int = 1, max_queue: int = 64):
+        self.name = name
+        self.max_queue = max_queue
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"ner-{name}"
+        )
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        # Счетчик меняется только в потоке event loop, блокировка не нужна
+        if self.pending >= self.max_queue:
+            raise QueueFullError(f"Очередь {self.name} переполнена ({self.max_queue})")
+        loop = asyncio.get_running_loop()
+        job = self.executor.submit(functools.partial(func, *args, **kwargs))
+        self.pending += 1
+        # Отмена ожидающей корутины не останавливает уже начатую задачу в потоке,
+        # поэтому место в очереди освобождается только по завершении самой задачи
+        job.add_done_callback(lambda _: self._release(loop))
+        return await asyncio.wrap_future(job, loop=loop)
+
+    def _release(self, loop: asyncio.AbstractEventLoop):
+        try:
+            loop.call_soon_threadsafe(self._decrement)
+        except RuntimeError:
+            # event loop уже закрыт (остановка сервиса)
+            pass
+
+    def _decrement(self):
+        self.pending -= 1
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)